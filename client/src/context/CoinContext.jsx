@@ -49,6 +49,18 @@ const CoinContextProvider = ({ children }) => {
     fetchAllCoin();
   }, [fetchAllCoin]);
 
+  // Apply pushed price deltas instead of re-fetching the whole list
+  useEffect(() => {
+    const source = new EventSource("http://127.0.0.1:5000/stream/prices");
+    source.addEventListener("price", (event) => {
+      const delta = JSON.parse(event.data);
+      setAllCoin((coins) =>
+        coins.map((coin) => (coin.id === delta.id ? { ...coin, market_price: delta.market_price } : coin))
+      );
+    });
+    return () => source.close();
+  }, []);
+
   return (
     <CoinContext.Provider value={{ allCoin, currency, setCurrency, user, setUser, fetchAllCoin, loading, error }}>
       {children}
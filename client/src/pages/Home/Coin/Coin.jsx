@@ -105,7 +105,9 @@ const Coin = () => {
 
     const fetchHistoricalData = async () => {
       try {
-        const response = await fetch(`http://127.0.0.1:5000/price-history/${coinId}`, {
+        // Hourly OHLC buckets for the last week keep the chart bounded to ~168 points
+        const from = Math.floor(Date.now() / 1000) - 7 * 24 * 60 * 60;
+        const response = await fetch(`http://127.0.0.1:5000/price-history/${coinId}?resolution=1h&from=${from}`, {
           method: 'GET',
           headers: { 'Content-Type': 'application/json' },
         });
@@ -9,6 +9,7 @@ const Home = () => {
   const [allCoin, setAllCoin] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [userWatchlist, setUserWatchlist] = useState([]);
   const coinsPerPage = 10;
@@ -31,6 +32,32 @@ const Home = () => {
     fetchData();
   }, []);
 
+  // Search server-side once typing pauses instead of filtering the full list
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(
+          `http://127.0.0.1:5000/cryptocurrencies/search?q=${encodeURIComponent(query)}&limit=100`,
+          { signal: controller.signal }
+        );
+        // Error bodies (400, 429) are objects, not result lists
+        setSearchResults(response.ok ? await response.json() : []);
+      } catch (error) {
+        if (error.name !== 'AbortError') console.error('Error searching:', error);
+      }
+    }, 150);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [searchQuery]);
+
   // Fetch the user's watchlist if the user is logged in (using token)
   const fetchWatchlist = async () => {
     try {
@@ -187,11 +214,7 @@ const Home = () => {
     return userWatchlist.some((entry) => entry.cryptocurrency_id === coinId);
   };
 
-  const filteredCoins = allCoin.filter(
-    (coin) =>
-      coin.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      coin.symbol.toLowerCase().includes(searchQuery.toLowerCase())
-  );
+  const filteredCoins = searchResults ?? allCoin;
 
   const indexOfLastCoin = currentPage * coinsPerPage;
   const indexOfFirstCoin = indexOfLastCoin - coinsPerPage;
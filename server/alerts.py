@@ -0,0 +1,191 @@
+# alerts.py
+import bisect
+import datetime
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, AlertTrigger, UserCryptocurrency
+from signals import prices_committed
+
+logger = logging.getLogger(__name__)
+
+_DIRTY = "alert-coins-dirty"
+
+
+class ThresholdIndex:
+    """Alert prices of one coin kept sorted, with watchlist row ids in parallel."""
+
+    __slots__ = ("prices", "ids")
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.prices = [price for price, _ in pairs]
+        self.ids = [row_id for _, row_id in pairs]
+
+    def add(self, price, row_id):
+        position = bisect.bisect_right(self.prices, price)
+        self.prices.insert(position, price)
+        self.ids.insert(position, row_id)
+
+    def crossed(self, previous, current):
+        """Return (row ids, direction) of thresholds crossed moving from previous to current.
+
+        Rising prices fire thresholds in (previous, current]; falling prices fire
+        thresholds in [current, previous). Two bisections plus a slice: O(log n + k).
+        """
+        if current > previous:
+            lo = bisect.bisect_right(self.prices, previous)
+            hi = bisect.bisect_right(self.prices, current)
+            return self.ids[lo:hi], "up"
+        if current < previous:
+            lo = bisect.bisect_left(self.prices, current)
+            hi = bisect.bisect_left(self.prices, previous)
+            return self.ids[lo:hi], "down"
+        return [], None
+
+    def __len__(self):
+        return len(self.prices)
+
+
+class AlertEngine:
+    """Evaluates watchlist alert prices against each ingested price move.
+
+    The per-coin indexes are built from one query and kept current three ways:
+    commits in this process mark the touched coins for reload, rows created by
+    other processes are picked up through an id high-water mark on every
+    evaluation, and the whole index is rebuilt every ``refresh_interval``
+    seconds to catch edits and deletes made elsewhere.
+    """
+
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self.indexes = {}
+        self._dirty = set()
+        self._high_water = 0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _rows(self, *criteria):
+        return db.session.query(
+            UserCryptocurrency.id, UserCryptocurrency.cryptocurrency_id, UserCryptocurrency.alert_price
+        ).filter(*criteria)
+
+    def load(self):
+        grouped = {}
+        high_water = 0
+        for row_id, coin_id, alert_price in self._rows():
+            grouped.setdefault(coin_id, []).append((float(alert_price), row_id))
+            high_water = max(high_water, row_id)
+        self.indexes = {coin_id: ThresholdIndex(pairs) for coin_id, pairs in grouped.items()}
+        self._high_water = high_water
+        self._dirty.clear()
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self, coin_ids):
+        with self._lock:
+            self._dirty.update(coin_ids)
+
+    def _sync(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.load()
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        # Only this scan moves the high-water mark, so rows other processes add to
+        # coins that are not being reloaded are never skipped
+        for row_id, coin_id, alert_price in self._rows(UserCryptocurrency.id > self._high_water):
+            self.indexes.setdefault(coin_id, ThresholdIndex()).add(float(alert_price), row_id)
+            self._high_water = max(self._high_water, row_id)
+        if dirty:
+            # Capped at the mark: anything newer is left to the next scan rather than indexed twice
+            grouped = {coin_id: [] for coin_id in dirty}
+            for row_id, coin_id, alert_price in self._rows(
+                UserCryptocurrency.cryptocurrency_id.in_(dirty), UserCryptocurrency.id <= self._high_water
+            ):
+                grouped[coin_id].append((float(alert_price), row_id))
+            for coin_id, pairs in grouped.items():
+                self.indexes[coin_id] = ThresholdIndex(pairs)
+
+    def evaluate(self, moves):
+        """Map {coin_id: (previous, current)} to a list of (row_id, coin_id, direction)."""
+        crossed = []
+        for coin_id, (previous, current) in moves.items():
+            index = self.indexes.get(coin_id)
+            if not index:
+                continue
+            row_ids, direction = index.crossed(float(previous), float(current))
+            crossed.extend((row_id, coin_id, direction) for row_id in row_ids)
+        return crossed
+
+    def process(self, ticks, previous):
+        """Record an AlertTrigger for every alert crossed by an ingestion tick."""
+        self._sync()
+        moves = {
+            coin_id: (previous[coin_id], price)
+            for coin_id, _, price, _ in ticks
+            if coin_id in previous
+        }
+        crossed = self.evaluate(moves)
+        if not crossed:
+            return []
+
+        # The index may lag edits made by other processes, so confirm each hit
+        # against the current row before recording it
+        current = {
+            row_id: (user_id, alert_price)
+            for row_id, user_id, alert_price in db.session.query(
+                UserCryptocurrency.id, UserCryptocurrency.user_id, UserCryptocurrency.alert_price
+            ).filter(UserCryptocurrency.id.in_([row_id for row_id, _, _ in crossed]))
+        }
+        triggered_at = datetime.datetime.utcnow()
+        triggers = []
+        for row_id, coin_id, direction in crossed:
+            if row_id not in current:
+                continue
+            user_id, alert_price = current[row_id]
+            before, after = moves[coin_id]
+            if not (before < alert_price <= after or after <= alert_price < before):
+                continue
+            triggers.append({
+                "user_id": user_id, "cryptocurrency_id": coin_id, "alert_price": alert_price,
+                "price_before": before, "price_after": after, "direction": direction,
+                "triggered_at": triggered_at,
+            })
+        db.session.bulk_insert_mappings(AlertTrigger, triggers)
+        db.session.commit()
+        return triggers
+
+
+engine = AlertEngine()
+
+
+@prices_committed.connect
+def _on_prices_committed(sender, ticks, previous, **kwargs):
+    try:
+        engine.process(ticks, previous)
+    except Exception:
+        db.session.rollback()
+        logger.exception("Alert evaluation failed")
+
+
+@event.listens_for(Session, "after_flush")
+def _track_watchlist_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, UserCryptocurrency):
+            session.info.setdefault(_DIRTY, set()).add(obj.cryptocurrency_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_watchlist_changes(session):
+    coin_ids = session.info.pop(_DIRTY, None)
+    if coin_ids:
+        engine.invalidate(coin_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_watchlist_changes(session):
+    session.info.pop(_DIRTY, None)
@@ -6,6 +6,7 @@ from flask_restful import Api
 from dotenv import load_dotenv
 from config import db, create_app
 from routes import routes
+import ingest
 
 # Load environment variables
 load_dotenv()
@@ -18,7 +19,7 @@ app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
 app.config["SESSION_COOKIE_SECURE"] = False  # Change to True in production with HTTPS
 
 # Enable CORS with credentials support
-CORS(app, supports_credentials=True)
+CORS(app, supports_credentials=True, expose_headers=["X-Next-Cursor"])
 api = Api(app)
 
 # Register the blueprint for all routes
@@ -29,4 +30,7 @@ def index():
     return "<h1>Kryptomaniac Cryptocurrency Tracking APP</h1>"
 
 if __name__ == "__main__":
+    # The debug reloader imports this module twice; only the serving child ingests
+    if app.config["INGEST_IN_PROCESS"] and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        ingest.start_background(app)
     app.run(port=5000, debug=True)
@@ -0,0 +1,229 @@
+# backfill.py
+import argparse
+import csv
+import datetime
+import itertools
+import os
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app
+
+import cache
+import history
+import retention
+import rollups
+import serialization
+from models import db, Cryptocurrency, PriceHistory
+
+CHUNK_SIZE = 50_000
+
+# Accepted column names, first match wins
+SYMBOL_COLUMNS = ("symbol", "ticker")
+TIMESTAMP_COLUMNS = ("timestamp", "recorded_at", "time", "date")
+PRICE_COLUMNS = ("price", "close")
+
+
+class ImportStats:
+    __slots__ = ("read", "inserted", "duplicates", "unknown_symbols", "invalid", "archived", "spans")
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.unknown_symbols = {}
+        self.invalid = 0
+        self.archived = 0
+        # {coin id: [earliest, latest]} timestamps seen for each coin
+        self.spans = {}
+
+    def to_dict(self):
+        return {
+            "read": self.read,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "archived": self.archived,
+            "unknown_symbols": dict(sorted(self.unknown_symbols.items())),
+        }
+
+
+def _pick(names, candidates, path):
+    for candidate in candidates:
+        if candidate in names:
+            return candidate
+    raise ValueError(f"{path}: no column named any of {', '.join(candidates)}")
+
+
+# -------------------- READERS --------------------
+# Each yields (symbol, timestamp, price) tuples without holding the file in memory
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader)]
+        positions = [
+            header.index(_pick(header, columns, path))
+            for columns in (SYMBOL_COLUMNS, TIMESTAMP_COLUMNS, PRICE_COLUMNS)
+        ]
+        s, t, p = positions
+        for row in reader:
+            if row:
+                yield row[s], row[t], row[p]
+
+
+def read_jsonl(path):
+    keys = None
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = serialization.loads(line)
+            if keys is None:
+                keys = [_pick(record, columns, path) for columns in (SYMBOL_COLUMNS, TIMESTAMP_COLUMNS, PRICE_COLUMNS)]
+            yield record[keys[0]], record[keys[1]], record[keys[2]]
+
+
+def read_parquet(path, batch_size=CHUNK_SIZE):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Reading Parquet needs pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(path)
+    names = parquet.schema_arrow.names
+    columns = [_pick(names, candidates, path) for candidates in (SYMBOL_COLUMNS, TIMESTAMP_COLUMNS, PRICE_COLUMNS)]
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+        yield from zip(*(batch.column(i).to_pylist() for i in range(len(columns))))
+
+
+READERS = {".csv": read_csv, ".jsonl": read_jsonl, ".ndjson": read_jsonl, ".parquet": read_parquet}
+
+
+def read_records(path, fmt=None):
+    extension = f".{fmt}" if fmt else os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported format {extension!r} (use csv, jsonl or parquet)")
+    return READERS[extension](path)
+
+
+# -------------------- PIPELINE --------------------
+
+def _timestamp(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value
+    return history.parse_timestamp(str(value))
+
+
+def resolve(records, symbol_ids, stats):
+    """Map (symbol, timestamp, price) records to price_history rows, skipping bad ones."""
+    for symbol, timestamp, price in records:
+        stats.read += 1
+        coin_id = symbol_ids.get(str(symbol).upper())
+        if coin_id is None:
+            stats.unknown_symbols[symbol] = stats.unknown_symbols.get(symbol, 0) + 1
+            continue
+        try:
+            recorded_at = _timestamp(timestamp)
+            price = Decimal(str(price))
+        except (ValueError, TypeError, InvalidOperation):
+            stats.invalid += 1
+            continue
+        if recorded_at is None or not price.is_finite():
+            stats.invalid += 1
+            continue
+        span = stats.spans.get(coin_id)
+        if span is None:
+            stats.spans[coin_id] = [recorded_at, recorded_at]
+        else:
+            span[0] = min(span[0], recorded_at)
+            span[1] = max(span[1], recorded_at)
+        yield {"cryptocurrency_id": coin_id, "recorded_at": recorded_at, "price": price}
+
+
+def chunked(rows, size):
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _insert_ignoring_duplicates(dialect):
+    """INSERT into price_history that skips rows clashing on (cryptocurrency_id, recorded_at)."""
+    table = PriceHistory.__table__
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Backfill supports SQLite and PostgreSQL databases, not {dialect}")
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=["cryptocurrency_id", "recorded_at"])
+
+
+def _archive_expired(stats):
+    """Move imported ticks below their coin's archive watermark into the archive.
+
+    Readers only look in price_history from the watermark on, so rows left
+    there would be invisible until the next retention run.
+    """
+    store = retention.archive()
+    watermarks = store.watermarks()
+    config = current_app.config
+    moved = retention.RetentionStats()
+    for coin_id, (first, _) in sorted(stats.spans.items()):
+        watermark = watermarks.get(coin_id)
+        if watermark is not None and first < watermark:
+            retention.archive_coin(store, coin_id, watermark, moved)
+            retention.purge_coin(coin_id, watermark, config["RETENTION_BATCH_SIZE"], 0, moved)
+    stats.archived = moved.archived
+
+
+def import_records(records, chunk_size=CHUNK_SIZE, rebuild_rollups=True):
+    """Stream ``records`` into price_history in chunks, one transaction per chunk.
+
+    Symbols are resolved against a dict loaded once up front and every chunk
+    is a single executemany, so memory stays at one chunk however large the
+    input is. Rows already present for a (coin, timestamp) are skipped.
+    Rows older than a coin's archive watermark are moved into the archive,
+    where retention would have put them. Imported history is usually older
+    than the live rollups, so each touched coin's candles are rebuilt over
+    the imported time span unless ``rebuild_rollups`` is False.
+    """
+    stats = ImportStats()
+    symbol_ids = dict(db.session.query(Cryptocurrency.symbol, Cryptocurrency.id))
+    statement = _insert_ignoring_duplicates(db.engine.dialect.name)
+
+    for chunk in chunked(resolve(records, symbol_ids, stats), chunk_size):
+        with db.engine.begin() as connection:
+            result = connection.execute(statement, chunk)
+        inserted = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(chunk)
+        stats.inserted += inserted
+        stats.duplicates += len(chunk) - inserted
+
+    if stats.inserted:
+        _archive_expired(stats)
+    if rebuild_rollups:
+        for coin_id, (first, last) in sorted(stats.spans.items()):
+            rollups.rebuild([coin_id], start=first, end=last + datetime.timedelta(microseconds=1))
+    if stats.inserted:
+        cache.bump("market")
+        cache.bump("history")
+    return stats
+
+
+if __name__ == '__main__':
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Import historical (symbol, timestamp, price) rows into price_history")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files")
+    parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], help="override detection by extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--no-rollups", action="store_true", help="skip rebuilding candles (run rollups.py later)")
+    args = parser.parse_args()
+
+    with app.app_context():
+        records = itertools.chain.from_iterable(read_records(path, args.format) for path in args.paths)
+        stats = import_records(records, args.chunk_size, rebuild_rollups=not args.no_rollups)
+        print(serialization.dumps(stats.to_dict(), pretty=True).decode())
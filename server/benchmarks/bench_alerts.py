@@ -0,0 +1,72 @@
+# bench_alerts.py
+# Alert evaluation cost with 1M alerts spread over the 100 seeded coins.
+# Run from server/: python -m benchmarks.bench_alerts [--alerts N] [--coins N] [--ticks N]
+import argparse
+import random
+import time
+
+from alerts import AlertEngine, ThresholdIndex
+
+
+def linear_scan(alerts, moves):
+    # Baseline: check every watchlist row on every tick
+    crossed = []
+    for row_id, coin_id, price in alerts:
+        previous, current = moves[coin_id]
+        if previous < price <= current or current <= price < previous:
+            crossed.append(row_id)
+    return crossed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--coins", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    prices = {coin_id: 10 ** rng.uniform(-2, 5) for coin_id in range(1, args.coins + 1)}
+    alerts = []
+    for row_id in range(1, args.alerts + 1):
+        coin_id = rng.randint(1, args.coins)
+        alerts.append((row_id, coin_id, prices[coin_id] * rng.uniform(0.5, 1.5)))
+
+    started = time.perf_counter()
+    grouped = {}
+    for row_id, coin_id, price in alerts:
+        grouped.setdefault(coin_id, []).append((price, row_id))
+    engine = AlertEngine()
+    engine.indexes = {coin_id: ThresholdIndex(pairs) for coin_id, pairs in grouped.items()}
+    build = time.perf_counter() - started
+
+    ticks = []
+    for _ in range(args.ticks):
+        moves = {}
+        for coin_id, price in prices.items():
+            new_price = price * (1 + rng.gauss(0, 0.01))
+            moves[coin_id] = (price, new_price)
+            prices[coin_id] = new_price
+        ticks.append(moves)
+
+    fired = 0
+    started = time.perf_counter()
+    for moves in ticks:
+        fired += len(engine.evaluate(moves))
+    indexed = (time.perf_counter() - started) / len(ticks)
+
+    sample = ticks[: max(1, min(5, len(ticks)))]
+    started = time.perf_counter()
+    scanned = sum(len(linear_scan(alerts, moves)) for moves in sample)
+    linear = (time.perf_counter() - started) / len(sample)
+    assert scanned == sum(len(engine.evaluate(moves)) for moves in sample)
+
+    print(f"alerts={args.alerts:,} coins={args.coins} ticks={args.ticks}")
+    print(f"index build:           {build * 1000:10.1f} ms")
+    print(f"indexed evaluate/tick: {indexed * 1000:10.3f} ms  ({fired / len(ticks):.0f} alerts fired per tick)")
+    print(f"linear scan/tick:      {linear * 1000:10.3f} ms  ({linear / indexed:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# bench_auth.py
+# Per-request cost of jwt_required on /check-session with and without the user cache.
+# Run from server/: python -m benchmarks.bench_auth [--requests N]
+import argparse
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from app import app
+        from models import db, User
+        from routes import authenticate, generate_token
+
+        with app.app_context():
+            db.create_all()
+            user = User(username="bench", email="bench@example.com", password_hash="x")
+            db.session.add(user)
+            db.session.commit()
+            token = generate_token(user)
+
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        for label, ttl in (("no cache", 0), ("user cache", 60)):
+            app.config["AUTH_CACHE_TTL"] = ttl
+            with app.test_request_context():
+                authenticate(token)
+                started = time.perf_counter()
+                for _ in range(args.requests):
+                    authenticate(token)
+                auth_only = (time.perf_counter() - started) / args.requests
+
+            client.get("/check-session", headers=headers)
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                client.get("/check-session", headers=headers)
+            full = (time.perf_counter() - started) / args.requests
+            print(f"{label:12} authenticate={auth_only * 1e6:8.1f} us  /check-session={full * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# bench_cache.py
+# Response cache backends on the catalog, history and trending endpoints. Part 1 times
+# a hit and a miss (forced by bumping the "market" version, as ingestion does) per
+# backend in-process. Part 2 starts --workers server processes on one backend and asks
+# each for the same new responses, counting SQL statements across all of them via
+# /metrics: per-worker memory caches build every response once per worker, shared
+# backends once in total. The Redis backend runs against a small in-process
+# RESP stand-in (StandInRedis) unless --redis-url points at a real server.
+# Run from server/: python -m benchmarks.bench_cache [--workers N] [--redis-url URL]
+import argparse
+import http.client
+import os
+import re
+import socketserver
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_http import PASSWORD, free_port, seed, start_server
+
+
+class StandInRedis(socketserver.ThreadingTCPServer):
+    """The subset of Redis that RedisBackend speaks, over real RESP on a local port."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port):
+        self.data = {}
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", port), StandInHandler)
+
+    def execute(self, command, args):
+        with self.lock:
+            if command == b"PING":
+                return b"+PONG\r\n"
+            if command in (b"SELECT", b"AUTH"):
+                return b"+OK\r\n"
+            if command == b"GET":
+                return bulk(self.lookup(args[0]))
+            if command == b"MGET":
+                return b"*%d\r\n" % len(args) + b"".join(bulk(self.lookup(key)) for key in args)
+            if command == b"SET":
+                ttl = int(args[3]) / 1000 if len(args) > 3 and args[2].upper() == b"PX" else None
+                self.data[args[0]] = (args[1], time.monotonic() + ttl if ttl else None)
+                return b"+OK\r\n"
+            if command == b"INCR":
+                value = int(self.lookup(args[0]) or 0) + 1
+                self.data[args[0]] = (str(value).encode(), None)
+                return b":%d\r\n" % value
+            return b"-ERR unknown command '%s'\r\n" % command
+
+    def lookup(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+def bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class StandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(self.server.execute(args[0].upper(), args[1:]))
+
+
+ROUTES = [
+    ("catalog", "/cryptocurrencies", False),
+    ("history raw", "/price-history/1?limit=1000", False),
+    ("history 1h", "/price-history/1?resolution=1h&limit=1000", False),
+    ("trending", "/trending-cryptocurrencies", True),
+]
+
+
+def in_process(app, urls, repeat):
+    import cache
+
+    client = app.test_client()
+    token = client.post("/login", json={"email": "user0@example.com", "password": PASSWORD}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"}
+    for backend_name, url in urls:
+        cache.backend = cache.backend_from_url(url)
+        for label, path, _ in ROUTES:
+            timings = {}
+            for mode in ("miss", "hit"):
+                client.get(path, headers=headers)
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    if mode == "miss":
+                        cache.bump("market")
+                    assert client.get(path, headers=headers).status_code == 200
+                timings[mode] = (time.perf_counter() - started) / repeat * 1e3
+            print(f"{backend_name:8} {label:12} miss {timings['miss']:7.2f} ms   hit {timings['hit']:6.3f} ms")
+
+
+def statements(port):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("GET", "/metrics")
+    text = connection.getresponse().read().decode()
+    return int(float(re.search(r"^db_statements_total (\S+)$", text, re.M).group(1)))
+
+
+def across_workers(env, urls, workers, rounds):
+    for backend_name, url in urls:
+        ports = [free_port() for _ in range(workers)]
+        servers = [start_server(port, dict(env, CACHE_URL=url)) for port in ports]
+        try:
+            before = sum(statements(port) for port in ports)
+            for round_number in range(rounds):
+                # A limit nobody has asked for yet makes a fresh cache key every round
+                for port in ports:
+                    connection = http.client.HTTPConnection("127.0.0.1", port)
+                    connection.request("GET", f"/cryptocurrencies?sort=-market_cap&limit={100 + round_number}")
+                    assert connection.getresponse().status == 200
+            # Every /metrics scrape itself issues no SQL, so the difference is the builds
+            total = sum(statements(port) for port in ports) - before
+            print(f"{backend_name:8} {workers} workers x {rounds} new catalog pages: {total:4} SQL statements")
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--redis-url", help="real server to use instead of the stand-in")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   INGEST_IN_PROCESS="0", COMPRESSION_MIN_SIZE="1024")
+        os.environ.update(env)
+        stand_in = None
+        redis_url = args.redis_url
+        if redis_url is None:
+            port = free_port()
+            stand_in = StandInRedis(port)
+            threading.Thread(target=stand_in.serve_forever, daemon=True).start()
+            redis_url = f"redis://127.0.0.1:{port}/0"
+
+        from app import app
+
+        with app.app_context():
+            seed(args.coins, history_coins=5, ticks=10_080, users=5, watchlist_size=10)
+
+        urls = [("memory", "memory://"), ("file", f"file://{os.path.join(tmp, 'cache')}"), ("redis", redis_url)]
+        in_process(app, urls, args.repeat)
+        across_workers(env, urls, args.workers, args.rounds)
+        if stand_in is not None:
+            stand_in.shutdown()
+
+
+if __name__ == "__main__":
+    main()
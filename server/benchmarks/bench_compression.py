@@ -0,0 +1,70 @@
+# bench_compression.py
+# Bytes on the wire and client parse time for /price-history as JSON, gzip/brotli JSON
+# and float64 columns, plus the cost of compressing /cryptocurrencies per request
+# versus serving the precompressed cached body.
+# Run from server/: python -m benchmarks.bench_compression [--coins N] [--ticks N]
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_serialization import seed
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        import compression
+        import serialization
+        from app import app
+        from routes import catalog_cache
+
+        with app.app_context():
+            seed(args.coins, args.ticks)
+        client = app.test_client()
+        codings = ["gzip"] + (["br"] if compression.brotli else [])
+
+        print(f"/price-history/1, 5000 rows (codings available: {', '.join(codings)})")
+        for label, url in (("raw", "/price-history/1?limit=5000"), ("5m", "/price-history/1?resolution=5m&limit=5000")):
+            for fmt in ("json", "columns"):
+                plain = client.get(f"{url}&format={fmt}").data
+                parse = json.loads if fmt == "json" else serialization.load_columns
+                parse_time, _ = timed(lambda: parse(plain), args.repeat)
+                sizes = "  ".join(
+                    f"{coding} {len(client.get(f'{url}&format={fmt}', headers={'Accept-Encoding': coding}).data) / 1024:6.1f} KiB"
+                    for coding in codings
+                )
+                print(f"  {label:4} {fmt:8} identity {len(plain) / 1024:6.1f} KiB  {sizes}  parse {parse_time * 1e3:6.2f} ms")
+
+        print(f"/cryptocurrencies ({args.coins} coins), gzip")
+        headers = {"Accept-Encoding": "gzip"}
+
+        def cold():
+            catalog_cache.clear()
+            return client.get("/cryptocurrencies", headers=headers)
+
+        cold_time, _ = timed(cold, args.repeat)
+        warm_time, response = timed(lambda: client.get("/cryptocurrencies", headers=headers), args.repeat * 10)
+        identity_time, _ = timed(lambda: client.get("/cryptocurrencies"), args.repeat * 10)
+        print(f"  rebuild + compress {cold_time * 1e3:7.2f} ms   precompressed hit {warm_time * 1e3:5.2f} ms   "
+              f"identity hit {identity_time * 1e3:5.2f} ms   ({len(response.data) / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
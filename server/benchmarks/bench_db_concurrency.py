@@ -0,0 +1,131 @@
+# bench_db_concurrency.py
+# Read throughput on a file-backed SQLite database while an ingestion process commits
+# ticks continuously, with and without the WAL/synchronous/mmap pragmas from config.py.
+# Run from server/: python -m benchmarks.bench_db_concurrency [--readers N] [--seconds N]
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+
+def make_quotes(coins):
+    from ingest import Quote
+
+    return [
+        Quote(f"C{i}", f"Coin {i}", Decimal(random.uniform(1, 1000)).quantize(Decimal("0.0001")),
+              Decimal(1_000_000), None, None)
+        for i in range(coins)
+    ]
+
+
+def run_writer(seconds, coins):
+    # The ingestion worker normally runs as its own process, so it writes from one here
+    from sqlalchemy.exc import OperationalError
+
+    from app import app
+    from ingest import Ingestor
+    from models import db
+
+    writes = errors = 0
+    with app.app_context():
+        ingestor = Ingestor(source=None)
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                ingestor.tick(make_quotes(coins))
+                writes += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    print(json.dumps({"writes": writes, "write_errors": errors}))
+
+
+def run_readers(readers, seconds, coins):
+    from app import app
+    from ingest import Ingestor
+    from models import db
+
+    with app.app_context():
+        db.create_all()
+        Ingestor(source=None).tick(make_quotes(coins))
+
+    writer = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_db_concurrency", "--role", "writer",
+         "--seconds", str(seconds), "--coins", str(coins)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    stop = threading.Event()
+    counts = {"reads": 0, "read_errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        client = app.test_client()
+        while not stop.is_set():
+            coin_id = random.randint(1, coins)
+            try:
+                ok = client.get(f"/price-history/{coin_id}?limit=200").status_code == 200
+            except Exception:
+                ok = False
+            with lock:
+                counts["reads" if ok else "read_errors"] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    written = json.loads(writer.communicate()[0].strip().splitlines()[-1])
+
+    return {
+        "reads_per_s": counts["reads"] / seconds,
+        "writes_per_s": written["writes"] / seconds,
+        "read_errors": counts["read_errors"],
+        "write_errors": written["write_errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--coins", type=int, default=100)
+    parser.add_argument("--role", choices=["readers", "writer"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "writer":
+        run_writer(args.seconds, args.coins)
+        return
+    if args.role == "readers":
+        print(json.dumps(run_readers(args.readers, args.seconds, args.coins)))
+        return
+
+    # Each case needs a fresh process: create_app reads its settings at import time
+    for label, pragmas in (("default journal", "false"), ("WAL + pragmas", "true")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                SQLITE_PRAGMAS=pragmas,
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_db_concurrency", "--role", "readers",
+                 "--readers", str(args.readers), "--seconds", str(args.seconds), "--coins", str(args.coins)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{label:16} reads/s={result['reads_per_s']:8.1f} writes/s={result['writes_per_s']:7.1f} "
+            f"read_errors={result['read_errors']} write_errors={result['write_errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+# bench_http.py
+# End-to-end HTTP load test: seeds a throwaway SQLite database (coins, minute-level
+# history with rollups, users with watchlists), starts the app in a separate server
+# process and drives every route in routes.py with concurrent keep-alive clients, one
+# route at a time for --duration seconds each. Prints throughput and p50/p95/p99 per
+# route and writes them to --output as JSON; --compare takes an earlier output file
+# and prints the change per route, so runs on two commits can be compared.
+# Run from server/: python -m benchmarks.bench_http [--coins N] [--concurrency N] [--output FILE]
+import argparse
+import datetime
+import http.client
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from decimal import Decimal
+
+import serialization
+
+PASSWORD = "load-test-password"
+
+# One benchmarked endpoint. path/body take the calling Worker; before/after are
+# untimed requests (same shape, minus the name) that set up and undo state around it
+Route = namedtuple("Route", ["name", "method", "path", "body", "auth", "before", "after"])
+Route.__new__.__defaults__ = (None, False, None, None)
+
+
+def new_account(worker):
+    n = worker.next()
+    return {"username": f"new-{worker.id}-{n}", "email": f"new-{worker.id}-{n}@example.com", "password": PASSWORD}
+
+
+def route_table(coins, history_coins):
+    coin = lambda w: w.rng.randint(1, coins)
+    tracked = lambda w: w.rng.randint(1, history_coins)
+    watched = lambda w: w.rng.choice(w.watchlist)
+    add = Route(None, "POST", lambda w: "/user-cryptocurrencies",
+                lambda w: {"crypto_id": w.spare, "alert_price": 100, "quantity": 1}, True)
+    remove = Route(None, "DELETE", lambda w: f"/user-cryptocurrencies/{w.spare}", None, True)
+
+    return [
+        # Auth
+        Route("POST /register", "POST", lambda w: "/register", new_account),
+        Route("POST /login", "POST", lambda w: "/login", lambda w: {"email": w.email, "password": PASSWORD}),
+        Route("POST /logout", "POST", lambda w: "/logout"),
+        Route("GET /check-session", "GET", lambda w: "/check-session", auth=True),
+        Route("GET /me", "GET", lambda w: "/me", auth=True),
+        Route("GET /debug-session", "GET", lambda w: "/debug-session", auth=True),
+        # Catalog
+        Route("GET /cryptocurrencies", "GET", lambda w: "/cryptocurrencies"),
+        Route("GET /cryptocurrencies?sort&limit&fields", "GET",
+              lambda w: "/cryptocurrencies?sort=-market_cap&limit=100&fields=name,symbol,market_price"),
+        Route("GET /cryptocurrencies/search", "GET",
+              lambda w: f"/cryptocurrencies/search?q={w.rng.choice(['co', 'coin+1', 'c', 'coin+42'])}"),
+        Route("GET /cryptocurrencies/correlation", "GET",
+              lambda w: f"/cryptocurrencies/correlation?window=7d&resolution=1h&ids={','.join(map(str, range(1, history_coins + 1)))}"),
+        Route("GET /cryptocurrencies/<id>", "GET", lambda w: f"/cryptocurrencies/{coin(w)}"),
+        Route("GET /cryptocurrencies/<id>/indicators", "GET",
+              lambda w: f"/cryptocurrencies/{tracked(w)}/indicators?resolution=1h"),
+        # History
+        Route("GET /price-history/<id>", "GET", lambda w: f"/price-history/{tracked(w)}?limit=1000"),
+        Route("GET /price-history/<id>?resolution=1h", "GET",
+              lambda w: f"/price-history/{tracked(w)}?resolution=1h&limit=1000"),
+        Route("GET /price-history/<id>?format=columns", "GET",
+              lambda w: f"/price-history/{tracked(w)}?limit=1000&format=columns"),
+        Route("GET /stream/prices (connect)", "GET", lambda w: "/stream/prices"),
+        # Watchlist
+        Route("GET /user-cryptocurrencies", "GET", lambda w: "/user-cryptocurrencies", auth=True),
+        Route("GET /watchlist", "GET", lambda w: "/watchlist", auth=True),
+        add._replace(name="POST /user-cryptocurrencies", after=remove),
+        remove._replace(name="DELETE /user-cryptocurrencies/<id>", before=add),
+        Route("POST /user-cryptocurrencies/batch", "POST", lambda w: "/user-cryptocurrencies/batch",
+              lambda w: {"update": [{"crypto_id": watched(w), "alert_price": w.rng.uniform(1, 1000)}]}, True),
+        Route("GET /portfolio", "GET", lambda w: "/portfolio", auth=True),
+        Route("GET /portfolio/history", "GET", lambda w: "/portfolio/history?resolution=1h", auth=True),
+        Route("GET /alerts", "GET", lambda w: "/alerts", auth=True),
+        # Trending
+        Route("GET /trending-cryptocurrencies", "GET", lambda w: "/trending-cryptocurrencies", auth=True),
+    ]
+
+
+# -------------------- SEEDING --------------------
+
+def seed(coins, history_coins, ticks, users, watchlist_size):
+    """Fill the current app's database; returns [(email, watched coin ids, spare coin id)] per user."""
+    import backfill
+    from ingest import Ingestor, Quote
+    from models import db, User, UserCryptocurrency
+
+    db.drop_all()
+    db.create_all()
+    rng = random.Random(42)
+    Ingestor(source=None).tick([
+        Quote(f"C{i}", f"Coin {i}", Decimal(rng.randint(1, 10**7)) / 100, Decimal(rng.randint(1, 10**12)),
+              f"https://example.com/{i}.png", Decimal(rng.randint(1, 10**9)), Decimal(rng.randint(-2000, 2000)) / 100)
+        for i in range(coins)
+    ])
+
+    # Minute ticks ending an hour ago, so they never collide with the live tick above
+    end = datetime.datetime.utcnow().replace(second=0, microsecond=0) - datetime.timedelta(hours=1)
+
+    def ticks_for(i):
+        price = rng.uniform(1, 50_000)
+        for minute in range(ticks, 0, -1):
+            price *= 1 + rng.gauss(0, 0.001)
+            yield f"C{i}", end - datetime.timedelta(minutes=minute), price
+
+    backfill.import_records(record for i in range(history_coins) for record in ticks_for(i))
+
+    # Every user shares one password hash; hashing it per user would dominate seeding
+    template = User(username="template", email="template@example.com")
+    template.set_password(PASSWORD)
+    db.session.bulk_insert_mappings(User, [
+        {"username": f"user{u}", "email": f"user{u}@example.com", "password_hash": template.password_hash}
+        for u in range(users)
+    ])
+    db.session.commit()
+    accounts, entries = [], []
+    for user_id, email in db.session.query(User.id, User.email).order_by(User.id):
+        picks = rng.sample(range(1, coins + 1), watchlist_size + 1)
+        watched, spare = picks[:-1], picks[-1]
+        accounts.append((email, watched, spare))
+        entries.extend(
+            {"user_id": user_id, "cryptocurrency_id": coin_id, "alert_price": rng.uniform(1, 1000),
+             "quantity": rng.uniform(0, 10), "cost_basis": rng.uniform(1, 1000)}
+            for coin_id in watched
+        )
+    db.session.bulk_insert_mappings(UserCryptocurrency, entries)
+    db.session.commit()
+    return accounts
+
+
+# -------------------- SERVER --------------------
+
+def serve(port):
+    import logging
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    from app import app
+
+    # One access-log line per request would cost more than some of the routes
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    # HTTP/1.1 so clients keep their connection open between requests, like a browser
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, env):
+    process = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "benchmarks.bench_http", "--serve", str(port)],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("Server process exited during startup")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not start listening within 30s")
+
+
+# -------------------- CLIENTS --------------------
+
+class Worker:
+    """One simulated client: a keep-alive connection, a seeded account and its token."""
+
+    def __init__(self, worker_id, port, account):
+        self.id = worker_id
+        self.email, self.watchlist, self.spare = account
+        self.rng = random.Random(worker_id)
+        self.count = 0
+        self.token = None
+        self.port = port
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+    def next(self):
+        self.count += 1
+        return self.count
+
+    def request(self, route):
+        body = route.body(self) if route.body else None
+        headers = {"Accept-Encoding": "gzip"}
+        if route.auth:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if body is not None:
+            body = serialization.dumps(body)
+            headers["Content-Type"] = "application/json"
+        try:
+            self.connection.request(route.method, route.path(self), body=body, headers=headers)
+            response = self.connection.getresponse()
+            if response.getheader("Content-Type", "").startswith("text/event-stream"):
+                # A stream never ends; the time to its headers is the connect latency
+                status, size = response.status, 0
+                self.reconnect()
+            else:
+                status, size = response.status, len(response.read())
+        except (OSError, http.client.HTTPException):
+            self.reconnect()
+            return None, 0
+        if response.will_close:
+            self.reconnect()
+        return status, size
+
+    def reconnect(self):
+        self.connection.close()
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+
+    def login(self):
+        self.connection.request("POST", "/login", body=serialization.dumps({"email": self.email, "password": PASSWORD}),
+                                headers={"Content-Type": "application/json"})
+        self.token = serialization.loads(self.connection.getresponse().read())["token"]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Nearest-rank: the smallest value with at least q% of samples at or below it
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def run_route(route, workers, duration):
+    """Drive ``route`` from every worker for ``duration`` seconds; returns the summary dict."""
+    latencies, statuses, sizes = [], Counter(), [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def drive(worker):
+        local, local_statuses, local_bytes = [], Counter(), 0
+        while time.monotonic() < stop:
+            if route.before:
+                worker.request(route.before)
+            started = time.perf_counter()
+            status, size = worker.request(route)
+            local.append(time.perf_counter() - started)
+            local_statuses[status or "error"] += 1
+            local_bytes += size
+            if route.after:
+                worker.request(route.after)
+        with lock:
+            latencies.extend(local)
+            statuses.update(local_statuses)
+            sizes[0] += local_bytes
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=drive, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: round(value * 1e3, 3) if value is not None else None
+    ok = sum(count for status, count in statuses.items() if status != "error" and status < 400)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "mean_bytes": round(sizes[0] / len(latencies)) if latencies else 0,
+    }
+
+
+# -------------------- REPORTING --------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_row(name, result, baseline=None):
+    line = (
+        f"{name:44} {result['throughput_rps']:9.1f} rps  p50 {result['p50_ms'] or 0:8.2f}  "
+        f"p95 {result['p95_ms'] or 0:8.2f}  p99 {result['p99_ms'] or 0:8.2f} ms  "
+        f"ok {result['ok']}/{result['requests']}"
+    )
+    if baseline and baseline.get("p50_ms") and result["p50_ms"]:
+        line += (
+            f"   vs base: rps {result['throughput_rps'] / baseline['throughput_rps'] - 1:+.0%}"
+            f"  p50 {result['p50_ms'] / baseline['p50_ms'] - 1:+.0%}"
+            f"  p99 {result['p99_ms'] / baseline['p99_ms'] - 1:+.0%}"
+        )
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=1000)
+    parser.add_argument("--history-coins", type=int, default=20, help="coins given minute-level history")
+    parser.add_argument("--ticks", type=int, default=10_080, help="history ticks per coin (default one week)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--watchlist", type=int, default=20, help="coins per user watchlist")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per route")
+    parser.add_argument("--routes", help="only run routes whose name contains this text")
+    parser.add_argument("--output", default="bench_http.json")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+    if args.users < args.concurrency:
+        parser.error("--users must be at least --concurrency (each client logs in as its own user)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   STREAM_HEARTBEAT="1", INGEST_IN_PROCESS="0")
+        os.environ.update(env)
+        from app import app
+
+        started = time.perf_counter()
+        with app.app_context():
+            accounts = seed(args.coins, args.history_coins, args.ticks, args.users, args.watchlist)
+        print(f"seeded {args.coins} coins, {args.history_coins * args.ticks} ticks, {args.users} users "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        port = free_port()
+        server = start_server(port, env)
+        try:
+            workers = [Worker(i, port, accounts[i]) for i in range(args.concurrency)]
+            for worker in workers:
+                worker.login()
+
+            routes = [r for r in route_table(args.coins, args.history_coins) if not args.routes or args.routes in r.name]
+            baseline = {}
+            if args.compare:
+                with open(args.compare, "rb") as f:
+                    baseline = serialization.loads(f.read())["routes"]
+
+            results = {}
+            for route in routes:
+                # A few untimed requests per client warm caches and connections
+                for worker in workers:
+                    for _ in range(2):
+                        if route.before:
+                            worker.request(route.before)
+                        worker.request(route)
+                        if route.after:
+                            worker.request(route.after)
+                results[route.name] = run_route(route, workers, args.duration)
+                print_row(route.name, results[route.name], baseline.get(route.name))
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "commit": git_commit(),
+        "generated_at": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": sys.version.split()[0],
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("serve", "output", "compare")},
+        "routes": results,
+    }
+    with open(args.output, "wb") as f:
+        f.write(serialization.dumps(report, pretty=True))
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
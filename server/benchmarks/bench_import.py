@@ -0,0 +1,99 @@
+# bench_import.py
+# Bulk backfill throughput: writes a synthetic (symbol, timestamp, price) CSV and JSONL,
+# imports them with backfill.import_records into a fresh SQLite database, then imports
+# the CSV again to measure the duplicate-skipping path. A per-row ORM insert over a
+# sample of the same rows is timed for comparison. Peak RSS shows memory stays flat.
+# Run from server/: python -m benchmarks.bench_import [--rows N] [--coins N]
+import argparse
+import datetime
+import os
+import random
+import resource
+import tempfile
+import time
+from decimal import Decimal
+
+
+def write_files(directory, rows, coins):
+    csv_path = os.path.join(directory, "history.csv")
+    jsonl_path = os.path.join(directory, "history.jsonl")
+    start = datetime.datetime(2020, 1, 1)
+    per_coin = rows // coins
+    with open(csv_path, "w") as csv_file, open(jsonl_path, "w") as jsonl_file:
+        csv_file.write("symbol,timestamp,price\n")
+        for coin in range(coins):
+            price = random.uniform(1, 50_000)
+            for minute in range(per_coin):
+                price *= 1 + random.gauss(0, 0.001)
+                stamp = (start + datetime.timedelta(minutes=minute)).isoformat()
+                csv_file.write(f"C{coin},{stamp},{price:.4f}\n")
+                # The JSONL file covers the next stretch so it adds rows rather than duplicates
+                later = (start + datetime.timedelta(minutes=per_coin + minute)).isoformat()
+                jsonl_file.write(f'{{"symbol":"C{coin}","timestamp":"{later}","price":{price:.4f}}}\n')
+    return csv_path, jsonl_path
+
+
+def orm_rows_per_second(records, sample):
+    from models import db, Cryptocurrency, PriceHistory
+    import history
+
+    ids = dict(db.session.query(Cryptocurrency.symbol, Cryptocurrency.id))
+    started = time.perf_counter()
+    for count, (symbol, stamp, price) in enumerate(records, start=1):
+        db.session.add(PriceHistory(
+            cryptocurrency_id=ids[symbol], recorded_at=history.parse_timestamp(stamp) - datetime.timedelta(days=3650),
+            price=Decimal(price),
+        ))
+        db.session.commit()
+        if count == sample:
+            break
+    return sample / (time.perf_counter() - started)
+
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--coins", type=int, default=200)
+    parser.add_argument("--sample", type=int, default=5000, help="rows for the per-row ORM comparison")
+    args = parser.parse_args()
+
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from app import app
+        import backfill
+        from ingest import Ingestor, Quote
+        from models import db
+
+        csv_path, jsonl_path = write_files(tmp, args.rows, args.coins)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            Ingestor(source=None).tick([
+                Quote(f"C{i}", f"Coin {i}", Decimal(1), Decimal(1), None, None) for i in range(args.coins)
+            ])
+
+            print(f"{args.rows} rows, {args.coins} coins   (peak RSS before import {peak_rss_mib():.0f} MiB)")
+            for label, path in (("csv", csv_path), ("jsonl", jsonl_path), ("csv again", csv_path)):
+                started = time.perf_counter()
+                stats = backfill.import_records(backfill.read_records(path), rebuild_rollups=False)
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{label:10} {stats.read / elapsed:10,.0f} rows/s   inserted {stats.inserted:>9}   "
+                    f"duplicates {stats.duplicates:>9}   {elapsed:6.2f} s   peak RSS {peak_rss_mib():.0f} MiB"
+                )
+
+            started = time.perf_counter()
+            backfill.rollups.rebuild()
+            print(f"rollup rebuild over {2 * args.rows} ticks: {time.perf_counter() - started:.2f} s")
+
+            rate = orm_rows_per_second(backfill.read_csv(csv_path), args.sample)
+            print(f"per-row ORM insert + commit ({args.sample} rows): {rate:10,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
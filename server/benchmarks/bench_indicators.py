@@ -0,0 +1,62 @@
+# bench_indicators.py
+# Indicator kernels on a synthetic 10M-point series: full O(n) computation, the
+# per-tick cost of extending cached state, and an O(n*w) naive baseline.
+# Run from server/: python -m benchmarks.bench_indicators [--points N] [--window N]
+import argparse
+import time
+
+import numpy as np
+
+from indicators import IndicatorState, extend
+
+
+def naive_sma_std(x, window):
+    # Recomputes every window from scratch, as a per-bucket loop would
+    mean = np.full(len(x), np.nan)
+    std = np.full(len(x), np.nan)
+    for i in range(window - 1, len(x)):
+        chunk = x[i - window + 1:i + 1]
+        mean[i] = chunk.mean()
+        std[i] = chunk.std()
+    return mean, std
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument("--window", type=int, default=20)
+    parser.add_argument("--naive-points", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    series = 30_000 * np.exp(np.cumsum(rng.normal(0, 0.001, args.points)))
+
+    elapsed, (values, state) = timed(extend, IndicatorState(), series, args.window)
+    print(f"points={args.points:,} window={args.window}")
+    print(f"full SMA/EMA/RSI/Bollinger:  {elapsed:8.3f} s  ({elapsed / args.points * 1e9:.1f} ns/point)")
+
+    ticks = 1000
+    started = time.perf_counter()
+    for close in series[-ticks:]:
+        extend(state, [close], args.window)
+    per_tick = (time.perf_counter() - started) / ticks
+    print(f"extend cached state by 1:    {per_tick * 1e6:8.1f} us/tick")
+
+    sample = series[: args.naive_points]
+    naive, _ = timed(naive_sma_std, sample, args.window)
+    fast, _ = timed(extend, IndicatorState(), sample, args.window)
+    print(
+        f"naive O(n*w) SMA+std on {args.naive_points:,} points: {naive:.3f} s "
+        f"vs {fast:.3f} s for all indicators ({naive / fast:.0f}x); "
+        f"naive extrapolated to {args.points:,}: {naive * args.points / args.naive_points:.0f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
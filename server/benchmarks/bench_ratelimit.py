@@ -0,0 +1,95 @@
+# bench_ratelimit.py
+# Latency for well-behaved clients while one client floods the server. A server process
+# is started per configuration (no protection, rate limiting, load shedding, both);
+# --abusers keep-alive connections from one client IP hammer /price-history as fast as
+# they can, varying the limit so every request misses the response cache, while
+# --clients paced clients from their own IPs read the catalog. Client IPs come from
+# X-Forwarded-For with RATE_LIMIT_PROXY_COUNT=1, as behind a reverse proxy.
+# Prints the paced clients' p50/p99 and success rate, and what the flood got back.
+# Run from server/: python -m benchmarks.bench_ratelimit [--abusers N] [--duration S]
+import argparse
+import http.client
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from benchmarks.bench_http import free_port, percentile, seed, start_server
+
+CONFIGURATIONS = [
+    ("unprotected", {"RATE_LIMIT_ENABLED": "0", "LOAD_SHED_MAX_IN_FLIGHT": "0"}),
+    ("rate limit", {"RATE_LIMIT_ENABLED": "1", "LOAD_SHED_MAX_IN_FLIGHT": "0"}),
+    ("load shedding", {"RATE_LIMIT_ENABLED": "0", "LOAD_SHED_MAX_IN_FLIGHT": "4"}),
+    ("both", {"RATE_LIMIT_ENABLED": "1", "LOAD_SHED_MAX_IN_FLIGHT": "4"}),
+]
+
+
+def client(port, ip, path, stop, pace, latencies, statuses):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    rng = random.Random(ip)
+    while not stop.is_set():
+        started = time.perf_counter()
+        connection.request("GET", path.format(rng.randint(500, 1000)), headers={"X-Forwarded-For": ip})
+        response = connection.getresponse()
+        response.read()
+        if latencies is not None:
+            latencies.append(time.perf_counter() - started)
+        statuses[response.status] += 1
+        if pace:
+            time.sleep(pace)
+
+
+def run(env, abusers, clients, duration):
+    port = free_port()
+    server = start_server(port, env)
+    stop = threading.Event()
+    latencies, good, flood = [], Counter(), Counter()
+    threads = [
+        threading.Thread(target=client, args=(port, "203.0.113.7", "/price-history/1?limit={}", stop, 0, None, flood))
+        for _ in range(abusers)
+    ] + [
+        threading.Thread(target=client, args=(port, f"198.51.100.{i}", "/cryptocurrencies?limit=50", stop, 0.1, latencies, good))
+        for i in range(clients)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    return latencies, good, flood
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--abusers", type=int, default=32, help="flooding connections from one IP")
+    parser.add_argument("--clients", type=int, default=4, help="paced clients, 10 requests/s each")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   INGEST_IN_PROCESS="0", RATE_LIMIT_PROXY_COUNT="1")
+        os.environ.update(env)
+        from app import app
+
+        with app.app_context():
+            seed(1000, history_coins=2, ticks=10_080, users=1, watchlist_size=1)
+
+        for name, overrides in CONFIGURATIONS:
+            latencies, good, flood = run(dict(env, **overrides), args.abusers, args.clients, args.duration)
+            served = good[200] / max(1, sum(good.values()))
+            flood_rate = {status: round(count / args.duration) for status, count in sorted(flood.items())}
+            print(f"{name:14} clients p50 {percentile(latencies, 50) * 1e3:7.1f} ms  p99 {percentile(latencies, 99) * 1e3:7.1f} ms"
+                  f"  ok {served:6.1%}   flood/s by status {flood_rate}")
+
+
+if __name__ == "__main__":
+    main()
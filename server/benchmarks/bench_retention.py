@@ -0,0 +1,98 @@
+# bench_retention.py
+# Retention on a file-backed SQLite database: archives and purges several months of
+# minute ticks while a reader thread keeps requesting /price-history, and reports the
+# reader's latency while the job runs against an idle baseline, plus archive size and
+# the read cost of a page served from the archive versus the table.
+# Run from server/: python -m benchmarks.bench_retention [--coins N] [--days N] [--batch N]
+import argparse
+import datetime
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+
+def reader(client, coin_ids, stop, latencies):
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.get(f"/price-history/{coin_ids[i % len(coin_ids)]}?resolution=1h&limit=500")
+        assert response.status_code == 200
+        latencies.append(time.perf_counter() - started)
+        i += 1
+
+
+def summary(latencies):
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3
+    return f"{len(latencies):6} requests  p50 {p(0.5):7.2f} ms  p99 {p(0.99):7.2f} ms  max {latencies[-1] * 1e3:7.2f} ms"
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=20)
+    parser.add_argument("--days", type=int, default=120, help="days of minute ticks per coin")
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=3.0, help="idle baseline duration")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["ARCHIVE_DIR"] = os.path.join(tmp, "archive")
+        os.environ["RETENTION_BATCH_SIZE"] = str(args.batch)
+        from app import app
+        import backfill
+        import retention
+        from ingest import Ingestor, Quote
+        from models import db
+
+        now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            Ingestor(source=None).tick([Quote(f"C{i}", f"Coin {i}", Decimal(1), Decimal(1), None, None)
+                                        for i in range(args.coins)])
+            ticks = args.days * 1440
+            start = now - datetime.timedelta(days=args.days)
+            backfill.import_records(
+                (f"C{c}", start + datetime.timedelta(minutes=m), 100 + c + m * 1e-4)
+                for c in range(args.coins) for m in range(ticks)
+            )
+            print(f"{args.coins} coins x {ticks} ticks, database {directory_size(tmp) / 2**20:.1f} MiB")
+
+        client = app.test_client()
+        coin_ids = list(range(1, args.coins + 1))
+        for label in ("idle", "during retention"):
+            latencies, stop = [], threading.Event()
+            thread = threading.Thread(target=reader, args=(client, coin_ids, stop, latencies))
+            thread.start()
+            started = time.perf_counter()
+            if label == "idle":
+                time.sleep(args.seconds)
+            else:
+                with app.app_context():
+                    stats = retention.run(now=now)
+            elapsed = time.perf_counter() - started
+            stop.set()
+            thread.join()
+            print(f"reader {label:17} {summary(latencies)}")
+        print(f"retention: {stats.to_dict()} in {elapsed:.1f}s ({stats.archived / elapsed:,.0f} ticks/s), "
+              f"archive {directory_size(os.path.join(tmp, 'archive')) / 2**20:.1f} MiB")
+
+        oldest = (start + datetime.timedelta(days=1)).isoformat()
+        newest = (now - datetime.timedelta(days=1)).isoformat()
+        for label, since in (("archive", oldest), ("table", newest)):
+            started = time.perf_counter()
+            for _ in range(20):
+                response = client.get(f"/price-history/1?from={since}&limit=1000")
+                assert len(response.get_json()) == 1000
+            print(f"1000-tick page from the {label:8} {(time.perf_counter() - started) / 20 * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench_search.py
+# /cryptocurrencies/search lookups on a synthetic catalog: trie lookup latency by query
+# length against the substring filter the client ran over the full list, plus the cost
+# of a full index build and of re-indexing one renamed coin.
+# Run from server/: python -m benchmarks.bench_search [--coins N]
+import argparse
+import random
+import string
+import time
+
+from search import SearchIndex
+
+WORDS = ["bit", "coin", "chain", "swap", "doge", "inu", "cash", "token", "gold", "link",
+         "meta", "verse", "moon", "safe", "net", "protocol", "finance", "ai", "pepe", "sol"]
+
+
+def make_coins(count, rng):
+    coins = []
+    for i in range(count):
+        name = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 3))) + f" {i}"
+        symbol = "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 5)))
+        coins.append({
+            "id": i + 1, "name": name, "symbol": symbol, "market_price": rng.uniform(0.01, 1000),
+            "market_cap": rng.lognormvariate(16, 3), "logo_url": None,
+        })
+    return coins
+
+
+def linear_search(coins, query, limit):
+    query = query.lower()
+    found = [c for c in coins if query in c["name"].lower() or query in c["symbol"].lower()]
+    return sorted(found, key=lambda c: -c["market_cap"])[:limit]
+
+
+def per_call(fn, *args, repeat=2000):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    coins = make_coins(args.coins, rng)
+
+    index = SearchIndex(refresh_interval=float("inf"))
+    started = time.perf_counter()
+    index.apply(coins)
+    print(f"coins={args.coins:,} full build: {(time.perf_counter() - started) * 1e3:.1f} ms")
+
+    for query in ("b", "bi", "bit", "bitcoin", "coin chain", "zzz"):
+        trie = per_call(index.search, query, args.limit)
+        linear = per_call(linear_search, coins, query, args.limit, repeat=20)
+        print(f"q={query!r:14} trie {trie * 1e6:7.1f} us   linear {linear * 1e6:9.1f} us")
+
+    # Alternate between two names so every call really re-indexes
+    renames = [[dict(coins[0], name=name)] for name in ("Renamed Protocol", "Bitcoin Gold Chain")]
+    started = time.perf_counter()
+    for i in range(200):
+        index.apply(renames[i % 2], complete=False)
+    print(f"re-index one renamed coin: {(time.perf_counter() - started) / 200 * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
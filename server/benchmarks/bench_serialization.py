@@ -0,0 +1,127 @@
+# bench_serialization.py
+# Before/after for the JSON layer on /cryptocurrencies and /price-history (raw and
+# bucketed). "before" re-creates the previous handlers: model instances or row dicts
+# with float()/str() per field, encoded by Flask's stdlib provider with compact=False.
+# "after" requests the real endpoints (response caches cleared on every request).
+# Run from server/: python -m benchmarks.bench_serialization [--coins N] [--ticks N]
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+
+def seed(coins, ticks):
+    from ingest import Ingestor, Quote
+    from models import db
+
+    db.drop_all()
+    db.create_all()
+    ingestor = Ingestor(source=None)
+    ingestor.tick([
+        Quote(f"C{i}", f"Coin {i}", Decimal(random.randint(1, 10**7)) / 100, Decimal(random.randint(1, 10**12)),
+              f"https://example.com/{i}.png", None, Decimal(random.randint(-2000, 2000)) / 100)
+        for i in range(coins)
+    ])
+    # A long minute-level history for coin 1, ingested in hourly batches
+    start = datetime.datetime.utcnow() - datetime.timedelta(minutes=ticks)
+    price = 30_000.0
+    for minute in range(ticks):
+        price *= 1 + random.gauss(0, 0.001)
+        ingestor.tick([Quote("C0", "Coin 0", Decimal(f"{price:.2f}"), Decimal(1), None, None)],
+                      recorded_at=start + datetime.timedelta(minutes=minute))
+
+
+def add_old_routes(app):
+    from flask.json.provider import DefaultJSONProvider
+
+    import history
+    import rollups
+    from models import db, Cryptocurrency, PriceCandle, PriceHistory
+
+    old = DefaultJSONProvider(app)
+    old.compact = False
+
+    @app.route("/_old/cryptocurrencies")
+    def old_catalog():
+        return old.response([crypto.to_dict() for crypto in Cryptocurrency.query.all()])
+
+    @app.route("/_old/price-history/<int:coin_id>")
+    def old_history(coin_id):
+        rows = (
+            db.session.query(PriceHistory.id, PriceHistory.recorded_at, PriceHistory.price)
+            .filter(PriceHistory.cryptocurrency_id == coin_id)
+            .order_by(PriceHistory.recorded_at.asc(), PriceHistory.id.asc())
+            .limit(history.MAX_LIMIT + 1)
+            .all()
+        )[: history.MAX_LIMIT]
+        return old.response([
+            {"id": h.id, "price": str(h.price), "recorded_at": h.recorded_at.isoformat()} for h in rows
+        ])
+
+    @app.route("/_old/price-history/<int:coin_id>/5m")
+    def old_buckets(coin_id):
+        query = db.session.query(
+            PriceCandle.bucket_start, PriceCandle.open, PriceCandle.high, PriceCandle.low, PriceCandle.close
+        ).filter(
+            PriceCandle.cryptocurrency_id == coin_id, PriceCandle.resolution == rollups.rollup_for(300)
+        ).order_by(PriceCandle.bucket_start.asc())
+        buckets, _ = history.downsample(query.yield_per(1000), 300, history.MAX_LIMIT)
+        return old.response([
+            {"recorded_at": b[0].isoformat(), "open": str(b[1]), "high": str(b[2]), "low": str(b[3]),
+             "close": str(b[4]), "price": str(b[4])}
+            for b in buckets
+        ])
+
+
+def measure(client, url, repeat, before=None):
+    sizes = set()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        if before:
+            before()
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        sizes.add(len(response.data))
+    return (time.perf_counter() - started) / repeat, max(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from app import app
+        from routes import catalog_cache, history_cache
+        import serialization
+
+        add_old_routes(app)
+        with app.app_context():
+            seed(args.coins, args.ticks)
+
+        client = app.test_client()
+        cases = [
+            (f"catalog ({args.coins} coins)", "/_old/cryptocurrencies", "/cryptocurrencies", catalog_cache.clear),
+            ("history raw (5000 ticks)", "/_old/price-history/1", "/price-history/1?limit=5000", history_cache.clear),
+            ("history 5m buckets", "/_old/price-history/1/5m", "/price-history/1?resolution=5m&limit=5000",
+             history_cache.clear),
+        ]
+        print(f"encoder: {'orjson' if serialization.orjson else 'stdlib json'}")
+        for label, old_url, new_url, before in cases:
+            old_time, old_size = measure(client, old_url, args.repeat, before)
+            new_time, new_size = measure(client, new_url, args.repeat, before)
+            print(
+                f"{label:28} before {old_time * 1e3:7.2f} ms {old_size / 1024:7.1f} KiB   "
+                f"after {new_time * 1e3:7.2f} ms {new_size / 1024:7.1f} KiB   ({old_time / new_time:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# bench_watchlist.py
+# SQL statements and latency of GET /watchlist as the watchlist grows. The statement
+# count must not depend on watchlist size; the script exits non-zero if it does.
+# Run from server/: python -m benchmarks.bench_watchlist [--sizes 1,10,100,500]
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,10,100,500")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from sqlalchemy import event
+
+        from app import app
+        from ingest import Ingestor, Quote
+        from models import db, User, UserCryptocurrency
+        from routes import generate_token
+
+        with app.app_context():
+            db.create_all()
+            ingestor = Ingestor(source=None)
+            start = datetime.datetime(2026, 1, 1)
+            for minute in range(5):
+                ingestor.tick([
+                    Quote(f"C{i}", f"Coin {i}", Decimal(100 + i + minute), Decimal(1_000_000), None, None)
+                    for i in range(max(sizes))
+                ], recorded_at=start + datetime.timedelta(minutes=minute))
+            tokens = {}
+            for size in sizes:
+                user = User(username=f"user{size}", email=f"user{size}@example.com", password_hash="x")
+                db.session.add(user)
+                db.session.flush()
+                db.session.bulk_insert_mappings(UserCryptocurrency, [
+                    {"user_id": user.id, "cryptocurrency_id": coin_id, "alert_price": Decimal(150)}
+                    for coin_id in range(1, size + 1)
+                ])
+                db.session.commit()
+                tokens[size] = generate_token(user)
+            engine = db.engine
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *a, **kw: statements.append(1))
+
+        client = app.test_client()
+        counts = set()
+        for size in sizes:
+            headers = {"Authorization": f"Bearer {tokens[size]}"}
+            client.get("/watchlist", headers=headers)  # warm the token cache
+            statements.clear()
+            response = client.get("/watchlist", headers=headers)
+            assert response.status_code == 200 and len(response.json) == size
+            counts.add(len(statements))
+            count = len(statements)
+
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                client.get("/watchlist", headers=headers)
+            elapsed = (time.perf_counter() - started) / args.requests
+            print(f"watchlist size={size:5d} statements={count} latency={elapsed * 1000:8.2f} ms")
+
+    if len(counts) != 1:
+        print(f"FAIL: statement count varies with watchlist size: {sorted(counts)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+# cache.py
+import datetime
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import pickle
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import compression
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CachedBody:
+    """A serialized response body, its custom headers and the validators derived from it."""
+
+    __slots__ = ("body", "mimetype", "headers", "etag", "last_modified", "encoded")
+
+    def __init__(self, body, mimetype, headers=()):
+        self.body = body
+        self.mimetype = mimetype
+        self.headers = tuple(headers)
+        # Content coding -> compressed body, filled on first request for each coding
+        self.encoded = {}
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+
+# -------------------- BACKENDS --------------------
+# Every backend stores values with a TTL plus integer version counters that never
+# expire. Shared backends pickle their values, so only point them at a store that
+# nothing but these workers can write to.
+
+class MemoryBackend:
+    """Per-process LRU; the default, and all a single worker needs."""
+
+    shared = False
+
+    def __init__(self, maxsize=2048):
+        self._values = TTLCache(maxsize=maxsize)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._values.get(key)
+
+    def set(self, key, value, ttl):
+        self._values.set(key, value, ttl)
+
+    def versions(self, names):
+        return [self._versions.get(name, 0) for name in names]
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """Any server speaking the Redis protocol (RESP2): Redis, Valkey, KeyDB or a stand-in.
+
+    Uses one connection per thread and only GET, SET PX, MGET and INCR, so
+    there is no client dependency. A failing server degrades to cache misses
+    and dropped writes rather than failing requests.
+    """
+
+    shared = True
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, prefix="kryptomaniac:", timeout=0.5):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader = sock, sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _call(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            arg = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._local.sock.sendall(b"".join(parts))
+        return self._reply()
+
+    def _reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            return None if length < 0 else self._local.reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._reply() for _ in range(length)]
+        raise RedisError(f"unexpected reply {line!r}")
+
+    def command(self, *args, default=None):
+        for attempt in (1, 2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._call(*args)
+            except (OSError, ConnectionError, RedisError) as e:
+                self._close()
+                # A pooled connection may have been dropped by the server; retry once on a fresh one
+                if attempt == 2 or isinstance(e, RedisError):
+                    logger.warning("Cache server %s:%s unavailable: %s", *self.address, e)
+                    return default
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def get(self, key):
+        data = self.command("GET", self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl):
+        self.command("SET", self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), "PX", max(1, int(ttl * 1000)))
+
+    def versions(self, names):
+        values = self.command("MGET", *(self.prefix + "version:" + name for name in names), default=None)
+        return [int(v) if v is not None else 0 for v in (values or [None] * len(names))]
+
+    def bump(self, name):
+        return self.command("INCR", self.prefix + "version:" + name, default=0)
+
+
+class FileBackend:
+    """Entries as files in one directory shared by every worker on a host.
+
+    Point it at tmpfs (the default is under /dev/shm) and it is shared
+    memory in all but name: reads are a page-cache copy, and writes go to a
+    temp file that is renamed over the entry, so readers never see a
+    partial one. Version counters are bumped under an flock. Expired entries
+    are removed when read, and one shard directory is swept every
+    ``sweep_every`` writes.
+    """
+
+    shared = True
+    _HEADER = struct.Struct("<d")
+
+    def __init__(self, directory, sweep_every=256):
+        self.directory = directory
+        self.sweep_every = sweep_every
+        self._writes = 0
+        os.makedirs(os.path.join(directory, "versions"), exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        (expires_at,) = self._HEADER.unpack_from(data)
+        if expires_at < time.time():
+            _remove(path)
+            return None
+        return pickle.loads(data[self._HEADER.size:])
+
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(self._HEADER.pack(time.time() + ttl))
+            f.write(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        os.replace(temporary, path)
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            self._sweep(os.path.dirname(path))
+
+    def _sweep(self, shard):
+        now = time.time()
+        for name in os.listdir(shard):
+            path = os.path.join(shard, name)
+            try:
+                with open(path, "rb") as f:
+                    header = f.read(self._HEADER.size)
+            except FileNotFoundError:
+                continue
+            if len(header) == self._HEADER.size and self._HEADER.unpack(header)[0] < now:
+                _remove(path)
+
+    def _version_path(self, name):
+        return os.path.join(self.directory, "versions", name)
+
+    def versions(self, names):
+        values = []
+        for name in names:
+            try:
+                with open(self._version_path(name), "rb") as f:
+                    values.append(int(f.read() or 0))
+            except FileNotFoundError:
+                values.append(0)
+        return values
+
+    def bump(self, name):
+        fd = os.open(self._version_path(name), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            version = int(os.read(fd, 32) or 0) + 1
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, str(version).encode())
+            return version
+        finally:
+            os.close(fd)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def backend_from_url(url, maxsize=2048):
+    """memory://, redis://[:password@]host[:port][/db] or file:///path/to/dir."""
+    parts = urlsplit(url)
+    if parts.scheme == "memory":
+        return MemoryBackend(maxsize=maxsize)
+    if parts.scheme == "redis":
+        return RedisBackend(
+            host=parts.hostname or "localhost", port=parts.port or 6379,
+            db=int(parts.path.strip("/") or 0), password=unquote(parts.password) if parts.password else None,
+        )
+    if parts.scheme == "file":
+        return FileBackend(unquote(parts.path))
+    raise ValueError(f"Unsupported CACHE_URL scheme: {url!r} (use memory://, redis:// or file://)")
+
+
+backend = MemoryBackend()
+
+
+def bump(name):
+    """Invalidate every ResponseCache that depends on version ``name``, in every worker sharing the backend."""
+    backend.bump(name)
+
+
+class ResponseCache:
+    """Namespaced entries in the configured backend, invalidated by version.
+
+    Keys embed the current value of the namespace's own version and of each
+    version in ``depends`` (e.g. "market", bumped by every ingestion
+    commit). Bumping one makes every worker miss at once without deleting
+    anything; superseded entries age out through their TTL.
+    """
+
+    def __init__(self, name, depends=()):
+        self.name = name
+        self.versions = (name, *depends)
+
+    @property
+    def shared(self):
+        return backend.shared
+
+    def slot(self, key):
+        versions = ".".join(map(str, backend.versions(self.versions)))
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return f"{self.name}:{versions}:{digest}"
+
+    def get(self, slot):
+        return backend.get(slot)
+
+    def set(self, slot, value, ttl):
+        backend.set(slot, value, ttl)
+
+    def clear(self):
+        backend.bump(self.name)
+
+
+def init_app(app):
+    global backend
+    backend = backend_from_url(app.config["CACHE_URL"], maxsize=app.config["CACHE_MAX_ENTRIES"])
+
+
+def cached_response(cache, key, build, ttl=None):
+    """Serve ``build()`` (a Flask response) through ResponseCache ``cache`` with ETag/Last-Modified.
+
+    Only the serialized bytes and any ``X-`` headers (such as pagination
+    cursors) are cached, along with each compressed variant once a client
+    has asked for it, so repeat hits cost no encoding or compression.
+    Conditional requests carrying a matching If-None-Match (or a fresh
+    If-Modified-Since) get a bodiless 304. The slot is resolved before
+    building, so a body built while a version is bumped is filed under the
+    old version and never served as current.
+    """
+    ttl = ttl or 60
+    slot = cache.slot(key)
+    entry = cache.get(slot)
+    if entry is None:
+        built = build()
+        headers = [(name, value) for name, value in built.headers if name.startswith("X-")]
+        entry = CachedBody(built.get_data(), built.mimetype, headers)
+        cache.set(slot, entry, ttl)
+
+    response = current_app.response_class(entry.body, mimetype=entry.mimetype, headers=list(entry.headers))
+    response.set_etag(entry.etag)
+    response.last_modified = entry.last_modified
+    if compression.eligible(response) and len(entry.body) >= current_app.config["COMPRESSION_MIN_SIZE"]:
+        response.vary.add("Accept-Encoding")
+        coding = compression.negotiate(request.accept_encodings)
+        if coding is not None:
+            encoded = entry.encoded.get(coding)
+            if encoded is None:
+                encoded = entry.encoded[coding] = compression.compress(entry.body, coding)
+                if cache.shared:
+                    # Other workers unpickle their own copy, so hand them the compressed one too
+                    cache.set(slot, entry, ttl)
+            response.set_data(encoded)
+            compression.mark_encoded(response, coding)
+    # Let browsers keep the body but revalidate it on every use
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+def invalidate_on_commit(cache, *models):
+    """Clear ``cache`` whenever a session commits changes to any of ``models``.
+
+    Bulk statements (``bulk_update_mappings``, ``query.update``) bypass the
+    unit of work, so callers using them must clear the cache themselves.
+    """
+    flag = f"invalidate-{id(cache)}"
+
+    @event.listens_for(Session, "after_flush")
+    def _track(session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, models):
+                session.info[flag] = True
+                return
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate(session):
+        if session.info.pop(flag, False):
+            cache.clear()
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        session.info.pop(flag, None)
+
+
+def evict_on_commit(cache, model):
+    """Drop ``cache`` entries keyed by the id of each ``model`` row a session commits an update to or deletes.
+
+    Inserts evict nothing, since nothing can be cached under an id before its
+    row exists. Bulk statements bypass this just as for ``invalidate_on_commit``.
+    """
+    flag = f"evict-{id(cache)}"
+
+    @event.listens_for(Session, "after_flush")
+    def _track(session, flush_context):
+        for obj in (*session.dirty, *session.deleted):
+            if isinstance(obj, model):
+                session.info.setdefault(flag, set()).add(obj.id)
+
+    @event.listens_for(Session, "after_commit")
+    def _evict(session):
+        for key in session.info.pop(flag, ()):
+            cache.pop(key)
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        session.info.pop(flag, None)
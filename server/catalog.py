@@ -0,0 +1,113 @@
+# catalog.py
+import base64
+import json
+from decimal import Decimal
+
+from sqlalchemy import Float, and_, cast, func, or_
+
+from models import db, Cryptocurrency
+
+# Public field name -> SQL expression yielding the value Cryptocurrency.to_dict
+# would produce, so rows can be serialized without touching model instances. Numerics
+# are CAST in SQL, not just coerced: SQLite returns integral NUMERIC values as ints,
+# which would serialize as JSON integers where to_dict gives floats
+FIELDS = {
+    "id": Cryptocurrency.id,
+    "name": Cryptocurrency.name,
+    "symbol": Cryptocurrency.symbol,
+    "market_price": cast(Cryptocurrency.market_price, Float),
+    "market_cap": cast(func.coalesce(Cryptocurrency.market_cap, 0), Float),
+    "logo_url": Cryptocurrency.logo_url,
+    "price_change_24h": cast(Cryptocurrency.price_change_24h, Float),
+}
+
+# ?sort= key -> column; prefix with "-" for descending
+SORTS = {
+    "id": Cryptocurrency.id,
+    "market_cap": Cryptocurrency.market_cap,
+    "price": Cryptocurrency.market_price,
+    "name": Cryptocurrency.name,
+    "change_24h": Cryptocurrency.price_change_24h,
+}
+
+MAX_LIMIT = 1000
+
+
+def parse_fields(value):
+    """Return the requested field names in catalog order, or all of them; id is always included."""
+    if not value:
+        return list(FIELDS)
+    requested = {name.strip() for name in value.split(",") if name.strip()} | {"id"}
+    unknown = requested - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (choose from {', '.join(FIELDS)})")
+    return [name for name in FIELDS if name in requested]
+
+
+def parse_sort(value):
+    """Return (sort key, descending) from values like ``market_cap`` or ``-change_24h``."""
+    value = value or "id"
+    descending = value.startswith("-")
+    key = value.lstrip("-")
+    if key not in SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(SORTS)} (prefix with - for descending)")
+    return key, descending
+
+
+# -------------------- CURSORS --------------------
+
+def encode_cursor(value, row_id):
+    if isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, key):
+    """Return (sort value, id) from an opaque cursor made for sort ``key``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if value is not None and key not in ("id", "name"):
+            value = Decimal(value)
+        return value, int(row_id)
+    except (ValueError, TypeError, ArithmeticError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+# -------------------- QUERY --------------------
+
+def page(fields, key, descending, limit=None, after=None):
+    """Fetch one page of the catalog with only ``fields`` selected.
+
+    Rows are ordered by the sort column (NULLs last) then id, so the
+    (value, id) of the last row is a stable keyset cursor for the next page
+    and each page is an index range scan. Returns (row tuples of the
+    ``fields`` values, next cursor or None).
+    """
+    column = SORTS[key]
+    query = db.session.query(*(FIELDS[name] for name in fields), column, Cryptocurrency.id)
+
+    if after is not None:
+        value, after_id = after
+        id_beyond = Cryptocurrency.id < after_id if descending else Cryptocurrency.id > after_id
+        if value is None:
+            query = query.filter(column.is_(None), id_beyond)
+        else:
+            beyond = column < value if descending else column > value
+            query = query.filter(or_(beyond, and_(column == value, id_beyond), column.is_(None)))
+
+    # Ties break on id in the same direction, which a single-column index
+    # already yields (it stores the row id after the key)
+    if descending:
+        query = query.order_by(column.desc().nulls_last(), Cryptocurrency.id.desc())
+    else:
+        query = query.order_by(column.asc().nulls_last(), Cryptocurrency.id.asc())
+    rows = query.limit(limit + 1).all() if limit is not None else query.all()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    # The trailing sort value and id are only for the cursor; zip() drops them
+    return rows, next_cursor
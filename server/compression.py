@@ -0,0 +1,75 @@
+# compression.py
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Types worth compressing; SSE is streamed and handled by proxies, if at all
+COMPRESSIBLE = ("application/json", "text/plain", "text/html", "text/csv", "application/vnd.price-columns")
+
+
+def _encoders():
+    level = current_app.config["COMPRESSION_LEVEL"]
+    encoders = {"gzip": lambda data: gzip.compress(data, compresslevel=level, mtime=0)}
+    if brotli is not None:
+        # Brotli quality runs 0-11; scale the shared 1-9 level onto it
+        encoders["br"] = lambda data: brotli.compress(data, quality=min(11, level + 1))
+    return encoders
+
+
+def negotiate(accept_encodings):
+    """Best supported content coding the client accepts (brotli first), or None."""
+    encoders = _encoders()
+    for coding in ("br", "gzip"):
+        if coding in encoders and accept_encodings[coding] > 0:
+            return coding
+    return None
+
+
+def compress(data, coding):
+    return _encoders()[coding](data)
+
+
+def eligible(response):
+    return (
+        current_app.config["COMPRESSION_ENABLED"]
+        and response.status_code == 200
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and "Content-Encoding" not in response.headers
+        and response.mimetype in COMPRESSIBLE
+    )
+
+
+def mark_encoded(response, coding):
+    response.headers["Content-Encoding"] = coding
+    response.vary.add("Accept-Encoding")
+    # The compressed bytes differ from the identity ones, so a strong validator
+    # would be wrong; a weak one still matches If-None-Match for 304s
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response):
+    """after_request hook: compress bodies of at least COMPRESSION_MIN_SIZE bytes."""
+    if not eligible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < current_app.config["COMPRESSION_MIN_SIZE"]:
+        return response
+    coding = negotiate(request.accept_encodings)
+    if coding is None:
+        return response
+    response.set_data(compress(data, coding))
+    mark_encoded(response, coding)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -1,10 +1,18 @@
 # config.py
+import os
 from flask import Flask
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, event
+
+import cache
+import compression
+import metrics
+import passwords
+import ratelimit
+import serialization
 
 # Define a naming convention for Alembic migrations
 metadata = MetaData(naming_convention={
@@ -14,17 +22,136 @@ metadata = MetaData(naming_convention={
 # Initialize SQLAlchemy without binding to an app immediately
 db = SQLAlchemy(metadata=metadata)
 
+def env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes')
+
+def engine_options(uri):
+    options = {
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    if uri.startswith('sqlite'):
+        # pysqlite waits this long on a locked database before raising
+        options['connect_args'] = {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000}
+    else:
+        options['pool_size'] = int(os.getenv('DB_POOL_SIZE', 10))
+        options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
+        options['pool_timeout'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    return options
+
+def apply_sqlite_pragmas(app, engine):
+    # WAL lets readers proceed while the ingestion writer holds the lock
+    pragmas = [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
 def create_app():
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///app.db')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.json.compact = False
+    app.config['SQLITE_PRAGMAS'] = env_flag('SQLITE_PRAGMAS', True)
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    # orjson-backed when installed; set JSON_COMPACT=false to pretty-print responses
+    app.json = serialization.FastJSONProvider(app)
+    app.json.compact = env_flag('JSON_COMPACT', True)
+    # Response cache shared by the catalog, history and trending endpoints: memory:// per
+    # worker, or redis://host:port/db / file:///dev/shm/<dir> shared by every worker
+    app.config['CACHE_URL'] = os.getenv('CACHE_URL', 'memory://')
+    app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 2048))
+    # Seconds a serialized body may be served before it is rebuilt (ingestion invalidates sooner)
+    app.config['CATALOG_CACHE_TTL'] = int(os.getenv('CATALOG_CACHE_TTL', 30))
+    app.config['HISTORY_CACHE_TTL'] = int(os.getenv('HISTORY_CACHE_TTL', 60))
+    app.config['TRENDING_CACHE_TTL'] = int(os.getenv('TRENDING_CACHE_TTL', 60))
+    app.config['CORRELATION_CACHE_TTL'] = int(os.getenv('CORRELATION_CACHE_TTL', 60))
+    # Seconds a validated token's user projection is reused (0 disables the cache)
+    app.config['AUTH_CACHE_TTL'] = int(os.getenv('AUTH_CACHE_TTL', 60))
+    app.config['AUTH_CACHE_SIZE'] = int(os.getenv('AUTH_CACHE_SIZE', 4096))
+    # Password hashing: any werkzeug method string; stored hashes using another method
+    # are upgraded on the next successful login. executor is inline, thread or process.
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    app.config['PASSWORD_HASH_EXECUTOR'] = os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 4))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+    app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 1.0))
+    # Market data ingestion: "coingecko" or "file:<path>" for a local fixture feed
+    app.config['MARKET_DATA_SOURCE'] = os.getenv('MARKET_DATA_SOURCE', 'coingecko')
+    app.config['INGEST_INTERVAL'] = float(os.getenv('INGEST_INTERVAL', 60))
+    app.config['INGEST_IN_PROCESS'] = env_flag('INGEST_IN_PROCESS', False)
+    # Server-sent price stream. Ticks ingested by other processes reach it by polling
+    # price_history every STREAM_POLL_INTERVAL seconds while clients are connected
+    # (0 limits the stream to ticks ingested in this process)
+    app.config['STREAM_MAX_SUBSCRIBERS'] = int(os.getenv('STREAM_MAX_SUBSCRIBERS', 500))
+    app.config['STREAM_HEARTBEAT'] = float(os.getenv('STREAM_HEARTBEAT', 15))
+    app.config['STREAM_POLL_INTERVAL'] = float(os.getenv('STREAM_POLL_INTERVAL', 1.0))
+    # gzip (and brotli, when installed) for responses of at least COMPRESSION_MIN_SIZE bytes
+    app.config['COMPRESSION_ENABLED'] = env_flag('COMPRESSION_ENABLED', True)
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+    app.config['COMPRESSION_LEVEL'] = int(os.getenv('COMPRESSION_LEVEL', 6))
+    # Trending: size of the ranked list and seconds between full recomputations
+    app.config['TRENDING_TOP_K'] = int(os.getenv('TRENDING_TOP_K', 10))
+    app.config['TRENDING_REFRESH_INTERVAL'] = float(os.getenv('TRENDING_REFRESH_INTERVAL', 300))
+    # Prometheus metrics on METRICS_PATH; requests slower than SLOW_REQUEST_MS are
+    # logged with the SQL they ran (0 disables the log)
+    app.config['METRICS_ENABLED'] = env_flag('METRICS_ENABLED', True)
+    app.config['METRICS_PATH'] = os.getenv('METRICS_PATH', '/metrics')
+    app.config['SLOW_REQUEST_MS'] = float(os.getenv('SLOW_REQUEST_MS', 0))
+    # Retention (python retention.py): raw ticks older than RETENTION_RAW_DAYS, in whole
+    # months, move to gzipped CSVs under ARCHIVE_DIR that /price-history still reads;
+    # 1m/1h candles are dropped after their day counts (0 keeps them), daily ones never
+    app.config['ARCHIVE_DIR'] = os.getenv('ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+    app.config['RETENTION_RAW_DAYS'] = int(os.getenv('RETENTION_RAW_DAYS', 30))
+    app.config['RETENTION_1M_DAYS'] = int(os.getenv('RETENTION_1M_DAYS', 90))
+    app.config['RETENTION_1H_DAYS'] = int(os.getenv('RETENTION_1H_DAYS', 0))
+    app.config['RETENTION_BATCH_SIZE'] = int(os.getenv('RETENTION_BATCH_SIZE', 1000))
+    app.config['RETENTION_BATCH_PAUSE'] = float(os.getenv('RETENTION_BATCH_PAUSE', 0.05))
+    # Token buckets per user (valid bearer token) or else per client IP: RATE tokens a
+    # second, up to BURST saved up. A request spends its endpoint's cost, from
+    # ratelimit.DEFAULT_COSTS overridden by RATE_LIMIT_COSTS ("routes.login=20,..."),
+    # and gets a 429 when its bucket is short. Buckets are kept per worker process.
+    # Off by default: behind a proxy, set RATE_LIMIT_PROXY_COUNT before enabling it, or
+    # every anonymous client shares the proxy's address and so one bucket
+    app.config['RATE_LIMIT_ENABLED'] = env_flag('RATE_LIMIT_ENABLED', False)
+    app.config['RATE_LIMIT_IP_RATE'] = float(os.getenv('RATE_LIMIT_IP_RATE', 20))
+    app.config['RATE_LIMIT_IP_BURST'] = float(os.getenv('RATE_LIMIT_IP_BURST', 400))
+    app.config['RATE_LIMIT_USER_RATE'] = float(os.getenv('RATE_LIMIT_USER_RATE', 20))
+    app.config['RATE_LIMIT_USER_BURST'] = float(os.getenv('RATE_LIMIT_USER_BURST', 200))
+    app.config['RATE_LIMIT_COSTS'] = dict(ratelimit.DEFAULT_COSTS, **ratelimit.parse_costs(os.getenv('RATE_LIMIT_COSTS', '')))
+    app.config['RATE_LIMIT_MAX_KEYS'] = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+    # Proxies in front of the app whose X-Forwarded-For entries name the client IP
+    app.config['RATE_LIMIT_PROXY_COUNT'] = int(os.getenv('RATE_LIMIT_PROXY_COUNT', 0))
+    # Load shedding: a fast 503 for requests arriving while LOAD_SHED_MAX_IN_FLIGHT are
+    # in progress in the worker, or that sat in the proxy's queue for more than
+    # LOAD_SHED_MAX_QUEUE_MS according to its X-Request-Start header (0 disables either)
+    app.config['LOAD_SHED_MAX_IN_FLIGHT'] = int(os.getenv('LOAD_SHED_MAX_IN_FLIGHT', 64))
+    app.config['LOAD_SHED_MAX_QUEUE_MS'] = float(os.getenv('LOAD_SHED_MAX_QUEUE_MS', 0))
 
     # Initialize extensions
     db.init_app(app)
+    passwords.init_app(app)
+    cache.init_app(app)
+    # Before compression, so its after_request hook runs last and sees the encoded size
+    metrics.init_app(app, db)
+    # After metrics, so rejected requests still show up in its counters
+    ratelimit.init_app(app)
+    compression.init_app(app)
+    if app.config['SQLITE_PRAGMAS'] and app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        with app.app_context():
+            apply_sqlite_pragmas(app, db.engine)
     Migrate(app, db)
     Api(app)
     # Enable CORS with credentials support
-    CORS(app, supports_credentials=True)
+    CORS(app, supports_credentials=True, expose_headers=["X-Next-Cursor"])
     
     return app
@@ -0,0 +1,153 @@
+# correlation.py
+import datetime
+
+import numpy as np
+from sqlalchemy import Float, select, type_coerce
+
+import cache
+import history
+import rollups
+from cache import TTLCache
+from models import db, Cryptocurrency, PriceCandle
+
+# Grid points per series; 1 year of hourly buckets fits with room to spare
+MAX_BUCKETS = 20_000
+
+
+# -------------------- ALIGNMENT --------------------
+
+def align(rows, cols, closes, n_rows, n_cols):
+    """Scatter (row, col, close) observations into an n_rows x n_cols grid and forward-fill.
+
+    ``cols`` must be non-decreasing within each row's observations (candles
+    come back in time order), so the last close landing in a cell wins.
+    Cells before a series' first observation stay NaN.
+    """
+    grid = np.full((n_rows, n_cols), np.nan)
+    if len(rows):
+        flat = rows * n_cols + cols
+        _, last_reversed = np.unique(flat[::-1], return_index=True)
+        keep = len(flat) - 1 - last_reversed
+        grid[rows[keep], cols[keep]] = closes[keep]
+    filled_at = np.where(np.isnan(grid), 0, np.arange(n_cols))
+    np.maximum.accumulate(filled_at, axis=1, out=filled_at)
+    return grid[np.arange(n_rows)[:, None], filled_at]
+
+
+def log_returns(grid):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(grid), axis=1)
+    returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+
+# -------------------- CORRELATION --------------------
+
+def correlation_matrix(returns):
+    """Pearson correlation between every pair of rows of ``returns``.
+
+    NaNs are handled pairwise: each pair uses only the periods where both
+    series have a return. All pair statistics come out of four matrix
+    products, so the cost is a handful of BLAS calls rather than a loop over
+    n^2 pairs. Pairs with fewer than two shared periods or zero variance are NaN.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    mask = ~np.isnan(returns)
+    if mask.all():
+        # Fast path: one centred product
+        centred = returns - returns.mean(axis=1, keepdims=True)
+        covariance = centred @ centred.T
+        scale = np.sqrt(np.diag(covariance))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = covariance / np.outer(scale, scale)
+    else:
+        m = mask.astype(np.float64)
+        x = np.where(mask, returns, 0.0)
+        # Shift by each row's mean to keep the sum-of-products cancellation small
+        mean = x.sum(axis=1, keepdims=True) / np.maximum(m.sum(axis=1, keepdims=True), 1)
+        x = np.where(mask, x - mean, 0.0)
+        n = m @ m.T
+        sx = x @ m.T          # sum of row i over periods shared with row j
+        sxx = (x * x) @ m.T
+        sxy = x @ x.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = n * sxy - sx * sx.T
+            variance = (n * sxx) - sx * sx
+            corr = covariance / np.sqrt(variance * variance.T)
+            corr[n < 2] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+    return corr
+
+
+# -------------------- QUERY --------------------
+
+# Keyed on the "market" version, which every ingestion commit seen by this process (or
+# by any worker, with a shared CACHE_URL backend) bumps; the TTL, CORRELATION_CACHE_TTL,
+# bounds staleness when ticks are ingested by a process this one cannot see
+matrix_cache = TTLCache(maxsize=64, ttl=60)
+
+
+def _load(seconds, start, end, ids):
+    query = (
+        select(PriceCandle.cryptocurrency_id, PriceCandle.bucket_start, type_coerce(PriceCandle.close, Float))
+        .where(
+            PriceCandle.resolution == rollups.rollup_for(seconds),
+            PriceCandle.bucket_start >= start,
+            PriceCandle.bucket_start < end,
+        )
+        .order_by(PriceCandle.bucket_start.asc())
+    )
+    if ids is not None:
+        query = query.where(PriceCandle.cryptocurrency_id.in_(ids))
+    return db.session.execute(query).all()
+
+
+def correlations(seconds, window, ids=None, now=None):
+    """Correlation of log returns over the last ``window`` seconds at ``seconds`` buckets.
+
+    Memoized per (window, resolution, ids) until the next ingestion commit.
+    """
+    key = (window, seconds, tuple(ids) if ids is not None else None, *cache.backend.versions(("market",)))
+    cached = matrix_cache.get(key)
+    if cached is not None:
+        return cached
+
+    now = now or datetime.datetime.utcnow()
+    end = history.bucket_start(now, seconds) + datetime.timedelta(seconds=seconds)
+    start = end - datetime.timedelta(seconds=window)
+    n_cols = window // seconds
+    if n_cols > MAX_BUCKETS:
+        raise ValueError(f"Window too long for this resolution (max {MAX_BUCKETS} points)")
+    if n_cols < 3:
+        raise ValueError("window must span at least three buckets")
+
+    rows = _load(seconds, start, end, ids)
+    if rows:
+        coin_ids, times, closes = zip(*rows)
+        coins, row_idx = np.unique(np.array(coin_ids, dtype=np.int64), return_inverse=True)
+        offsets = (np.array(times, dtype="datetime64[s]") - np.datetime64(start, "s")).astype(np.int64)
+        grid = align(
+            row_idx.reshape(-1), offsets // seconds, np.array(closes, dtype=np.float64), len(coins), n_cols
+        )
+        corr = correlation_matrix(log_returns(grid))
+        coin_ids = coins.tolist()
+    else:
+        corr = np.empty((0, 0))
+        coin_ids = []
+
+    symbols = dict(
+        db.session.query(Cryptocurrency.id, Cryptocurrency.symbol).filter(Cryptocurrency.id.in_(coin_ids))
+    ) if coin_ids else {}
+    result = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "points": n_cols,
+        "ids": coin_ids,
+        "symbols": [symbols.get(coin_id) for coin_id in coin_ids],
+        "matrix": [
+            [None if np.isnan(v) else round(v, 6) for v in row]
+            for row in corr.tolist()
+        ],
+    }
+    matrix_cache.set(key, result)
+    return result
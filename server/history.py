@@ -0,0 +1,131 @@
+# history.py
+import base64
+import datetime
+
+# Bucket sizes (in seconds) accepted by the ?resolution= parameter
+RESOLUTIONS = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "4h": 4 * 3600,
+    "1d": 86400,
+    "1w": 7 * 86400,
+}
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def parse_timestamp(value):
+    """Parse an ISO-8601 string or unix seconds into a naive UTC datetime."""
+    if value is None or value == "":
+        return None
+    try:
+        return datetime.datetime.utcfromtimestamp(float(value))
+    except (TypeError, ValueError, OverflowError):
+        pass
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    if value is None or value == "":
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
+
+
+def parse_resolution(value):
+    """Return the bucket size in seconds, or None for raw ticks."""
+    if value is None or value in ("", "raw"):
+        return None
+    if value not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of: raw, {', '.join(RESOLUTIONS)}")
+    return RESOLUTIONS[value]
+
+
+DURATION_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_duration(value):
+    """Parse spans like ``90m``, ``24h``, ``30d`` or ``52w`` into seconds."""
+    try:
+        amount, unit = int(value[:-1]), DURATION_UNITS[value[-1]]
+    except (TypeError, ValueError, KeyError, IndexError):
+        raise ValueError(f"Invalid duration: {value} (use e.g. 24h, 30d, 52w)")
+    if amount < 1:
+        raise ValueError("duration must be positive")
+    return amount * unit
+
+
+# -------------------- CURSORS --------------------
+
+def encode_cursor(recorded_at, row_id=None):
+    raw = recorded_at.isoformat() if row_id is None else f"{recorded_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (recorded_at, id) from an opaque cursor; id is None for bucket cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp, _, row_id = raw.partition("|")
+        return datetime.datetime.fromisoformat(timestamp), int(row_id) if row_id else None
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+# -------------------- DOWNSAMPLING --------------------
+
+def bucket_start(recorded_at, seconds):
+    offset = int((recorded_at - EPOCH).total_seconds())
+    return EPOCH + datetime.timedelta(seconds=offset - offset % seconds)
+
+
+def downsample(points, seconds, limit=None):
+    """Fold time-ordered (recorded_at, open, high, low, close) tuples into OHLC buckets.
+
+    Raw ticks are passed as (recorded_at, price, price, price, price). Stops
+    consuming ``points`` once ``limit`` buckets are complete, so callers can
+    stream an open-ended query and fetch one bucket past the page to detect
+    whether there is more data.
+    """
+    buckets = []
+    current = None
+    for recorded_at, open_, high, low, close in points:
+        start = bucket_start(recorded_at, seconds)
+        if current is None or current[0] != start:
+            if limit is not None and len(buckets) == limit:
+                return buckets, True
+            current = [start, open_, high, low, close]
+            buckets.append(current)
+        else:
+            if high > current[2]:
+                current[2] = high
+            if low < current[3]:
+                current[3] = low
+            current[4] = close
+    return buckets, False
+
+
+BUCKET_KEYS = ("recorded_at", "open", "high", "low", "close", "price")
+
+
+def bucket_row(bucket):
+    """Row for ``serialization.dump_rows`` under BUCKET_KEYS; price repeats the close."""
+    start, open_, high, low, close = bucket
+    return start, open_, high, low, close, close
@@ -0,0 +1,224 @@
+# indicators.py
+import datetime
+import threading
+
+import numpy as np
+
+import cache
+import history
+import rollups
+from cache import TTLCache
+from models import db, PriceCandle
+
+# Closed buckets kept per cached series; responses are capped to this many points
+MAX_POINTS = history.MAX_LIMIT
+
+
+# -------------------- O(n) KERNELS --------------------
+
+def ema(x, alpha, seed=None):
+    """Exponential moving average y_t = alpha * x_t + (1 - alpha) * y_{t-1}.
+
+    Evaluated in closed form per block with cumulative sums, so the recursion
+    costs O(n) vectorized work instead of a Python loop. Blocks are sized so
+    (1 - alpha) ** -block stays far from float overflow. ``seed`` is y_{-1};
+    without one the series starts at x_0.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty_like(x)
+    if not len(x):
+        return out
+    beta = 1.0 - alpha
+    previous = x[0] if seed is None else seed
+    if beta <= 0:
+        out[:] = x
+        return out
+    block = int(min(65536, max(1, -600 / np.log(beta))))
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        powers = beta ** np.arange(len(chunk))
+        values = beta * powers * previous + alpha * powers * np.cumsum(chunk / powers)
+        out[start:start + len(chunk)] = values
+        previous = values[-1]
+    return out
+
+
+def rolling_mean_std(x, window):
+    """Mean and population std of every full window of ``x`` (len(x) - window + 1 values)."""
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) < window:
+        return np.empty(0), np.empty(0)
+    centred = x - x.mean()  # keeps the sum-of-squares cancellation small
+    sums = np.cumsum(np.concatenate(([0.0], centred)))
+    squares = np.cumsum(np.concatenate(([0.0], centred * centred)))
+    window_sums = sums[window:] - sums[:-window]
+    window_squares = squares[window:] - squares[:-window]
+    mean = window_sums / window
+    variance = np.maximum(window_squares / window - mean * mean, 0.0)
+    return mean + x.mean(), np.sqrt(variance)
+
+
+class IndicatorState:
+    """Everything needed to extend the indicators by more closes without the history."""
+
+    __slots__ = ("tail", "ema", "avg_gain", "avg_loss", "count")
+
+    def __init__(self, tail=None, ema=None, avg_gain=None, avg_loss=None, count=0):
+        self.tail = np.empty(0) if tail is None else tail
+        self.ema = ema
+        self.avg_gain = avg_gain
+        self.avg_loss = avg_loss
+        self.count = count
+
+
+def extend(state, closes, window, k=2.0):
+    """Compute SMA/EMA/RSI/Bollinger for ``closes`` following ``state``.
+
+    Returns (indicator arrays aligned with ``closes``, new state). The state
+    carries the last ``window`` closes and the EMA/Wilder averages, so each
+    call is O(len(closes)) however long the series already is.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    n = len(closes)
+    joined = np.concatenate((state.tail, closes))
+
+    mean, std = rolling_mean_std(joined, window)
+    sma = np.full(n, np.nan)
+    upper = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+    full = min(n, len(mean))
+    if full:
+        sma[n - full:] = mean[-full:]
+        upper[n - full:] = mean[-full:] + k * std[-full:]
+        lower[n - full:] = mean[-full:] - k * std[-full:]
+
+    ema_values = ema(closes, 2.0 / (window + 1), state.ema)
+
+    # Wilder's RSI: gains and losses smoothed with alpha = 1 / window
+    previous = state.tail[-1:] if len(state.tail) else closes[:1]
+    changes = np.diff(np.concatenate((previous, closes)))
+    gains = ema(np.maximum(changes, 0.0), 1.0 / window, state.avg_gain)
+    losses = ema(np.maximum(-changes, 0.0), 1.0 / window, state.avg_loss)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(losses == 0, 100.0, 100.0 - 100.0 / (1.0 + gains / losses))
+    seen = state.count + np.arange(1, n + 1)
+    rsi[seen <= window] = np.nan
+
+    new_state = IndicatorState(
+        tail=joined[-window:],
+        ema=ema_values[-1] if n else state.ema,
+        avg_gain=gains[-1] if n else state.avg_gain,
+        avg_loss=losses[-1] if n else state.avg_loss,
+        count=state.count + n,
+    )
+    values = {"sma": sma, "ema": ema_values, "rsi": rsi, "bollinger_upper": upper, "bollinger_lower": lower}
+    return values, new_state
+
+
+# -------------------- CACHED SERIES --------------------
+
+class IndicatorSeries:
+    """Indicators for the closed buckets of one (coin, resolution, window, k).
+
+    Closed buckets never change, so they are computed once; each request only
+    folds in buckets that closed since the last one and evaluates the still
+    open bucket on top of the saved state without storing it.
+    """
+
+    def __init__(self, cryptocurrency_id, seconds, window, k):
+        self.cryptocurrency_id = cryptocurrency_id
+        self.seconds = seconds
+        self.window = window
+        self.k = k
+        self.state = IndicatorState()
+        self.times = []
+        self.closes = np.empty(0)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _candles(self, since):
+        query = db.session.query(
+            PriceCandle.bucket_start, PriceCandle.open, PriceCandle.high, PriceCandle.low, PriceCandle.close
+        ).filter(
+            PriceCandle.cryptocurrency_id == self.cryptocurrency_id,
+            PriceCandle.resolution == rollups.rollup_for(self.seconds),
+        )
+        if since is not None:
+            query = query.filter(PriceCandle.bucket_start >= since)
+        else:
+            # Cold start: enough history for the response plus indicator warm-up
+            lookback = (MAX_POINTS + 10 * self.window) * self.seconds
+            query = query.filter(
+                PriceCandle.bucket_start >= datetime.datetime.utcnow() - datetime.timedelta(seconds=lookback)
+            )
+        buckets, _ = history.downsample(query.order_by(PriceCandle.bucket_start.asc()), self.seconds)
+        return buckets
+
+    def refresh(self, now=None):
+        """Fold newly closed buckets into the cache; returns the open bucket, if any."""
+        now = now or datetime.datetime.utcnow()
+        since = self.times[-1] + datetime.timedelta(seconds=self.seconds) if self.times else None
+        buckets = self._candles(since)
+        closed = [b for b in buckets if b[0] + datetime.timedelta(seconds=self.seconds) <= now]
+        open_bucket = buckets[len(closed)] if len(closed) < len(buckets) else None
+
+        if closed:
+            closes = np.array([float(b[4]) for b in closed])
+            values, self.state = extend(self.state, closes, self.window, self.k)
+            self.times.extend(b[0] for b in closed)
+            self.closes = np.concatenate((self.closes, closes))
+            self.values = {
+                name: np.concatenate((self.values.get(name, np.empty(0)), array))
+                for name, array in values.items()
+            }
+            if len(self.times) > MAX_POINTS:
+                drop = len(self.times) - MAX_POINTS
+                self.times = self.times[drop:]
+                self.closes = self.closes[drop:]
+                self.values = {name: array[drop:] for name, array in self.values.items()}
+        return open_bucket
+
+    def points(self, limit, now=None):
+        with self.lock:
+            open_bucket = self.refresh(now)
+            times = self.times[-limit:]
+            closes = self.closes[-limit:]
+            values = {name: array[-limit:] for name, array in self.values.items()}
+            if open_bucket is not None:
+                provisional, _ = extend(self.state, [float(open_bucket[4])], self.window, self.k)
+                times = times + [open_bucket[0]]
+                closes = np.append(closes, float(open_bucket[4]))
+                values = {name: np.append(values.get(name, np.empty(0)), provisional[name]) for name in provisional}
+                if len(times) > limit:
+                    times, closes = times[1:], closes[1:]
+                    values = {name: array[1:] for name, array in values.items()}
+
+        columns = {name: _json_floats(array) for name, array in values.items()}
+        return [
+            {
+                "recorded_at": at.isoformat(),
+                "close": close,
+                "closed": at + datetime.timedelta(seconds=self.seconds) <= (now or datetime.datetime.utcnow()),
+                **{name: column[i] for name, column in columns.items()},
+            }
+            for i, (at, close) in enumerate(zip(times, closes.tolist()))
+        ]
+
+
+def _json_floats(array):
+    return [None if np.isnan(v) else v for v in array.tolist()]
+
+
+# Series extend themselves as buckets close, so they are keyed on the "history" version
+# (bumped when backfill, retention or a rollup rebuild rewrites past candles) rather
+# than on "market", which every ingestion commit bumps
+series_cache = TTLCache(maxsize=512, ttl=3600)
+
+
+def indicator_points(cryptocurrency_id, seconds, window, k, limit):
+    key = (cryptocurrency_id, seconds, window, k, *cache.backend.versions(("history",)))
+    series = series_cache.get(key)
+    if series is None:
+        series = IndicatorSeries(cryptocurrency_id, seconds, window, k)
+        series_cache.set(key, series)
+    return series.points(limit)
@@ -0,0 +1,232 @@
+# ingest.py
+import argparse
+import datetime
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from decimal import Decimal
+
+import requests
+
+import rollups
+from models import db, Cryptocurrency, PriceHistory
+from signals import prices_committed
+
+logger = logging.getLogger(__name__)
+
+COINGECKO_URL = "https://api.coingecko.com/api/v3/coins/markets"
+
+# volume is the rolling 24h trading volume, not the volume traded since the last tick
+Quote = namedtuple(
+    "Quote", ["symbol", "name", "price", "market_cap", "logo_url", "volume", "change_24h"], defaults=(None,)
+)
+
+
+def quote_from_market(coin):
+    """Normalize one entry of a CoinGecko /coins/markets payload."""
+    return Quote(
+        symbol=coin["symbol"].upper(),
+        name=coin["name"],
+        price=Decimal(str(coin["current_price"])),
+        market_cap=Decimal(str(coin.get("market_cap") or 0)),
+        logo_url=coin.get("image"),
+        volume=Decimal(str(coin["total_volume"])) if coin.get("total_volume") is not None else None,
+        change_24h=(
+            Decimal(str(coin["price_change_percentage_24h"]))
+            if coin.get("price_change_percentage_24h") is not None else None
+        ),
+    )
+
+
+# -------------------- SOURCES --------------------
+
+class MarketDataSource:
+    """Pluggable feed of market quotes; ``fetch`` returns a list of ``Quote``."""
+
+    def fetch(self):
+        raise NotImplementedError
+
+
+class CoinGeckoSource(MarketDataSource):
+    def __init__(self, currency="usd", per_page=100, api_key=None, timeout=10):
+        self.currency = currency
+        self.per_page = per_page
+        # Optional demo-plan key; without one the public (lower rate limit) API is used. Read
+        # here rather than at import so a key from .env (loaded by app.py after its imports) counts
+        self.api_key = api_key if api_key is not None else os.getenv("COINGECKO_API_KEY")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def fetch(self):
+        headers = {"accept": "application/json"}
+        if self.api_key:
+            headers["x-cg-demo-api-key"] = self.api_key
+        response = self.session.get(
+            COINGECKO_URL,
+            params={
+                "vs_currency": self.currency,
+                "order": "market_cap_desc",
+                "per_page": self.per_page,
+                "page": 1,
+                "price_change_percentage": "24h",
+            },
+            headers=headers,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return [quote_from_market(coin) for coin in response.json()]
+
+
+class FileSource(MarketDataSource):
+    """Replays CoinGecko-shaped market snapshots from a local file.
+
+    A ``.json`` file holds a single snapshot returned on every fetch; a
+    ``.jsonl`` file holds one snapshot per line, replayed in order and then
+    cycled, so fixtures can drive price movements without network access.
+    """
+
+    def __init__(self, path):
+        with open(path) as f:
+            if path.endswith(".jsonl"):
+                self.frames = [json.loads(line) for line in f if line.strip()]
+            else:
+                self.frames = [json.load(f)]
+        self.position = 0
+
+    def fetch(self):
+        frame = self.frames[self.position % len(self.frames)]
+        self.position += 1
+        return [quote_from_market(coin) for coin in frame]
+
+
+def source_from_config(spec):
+    """Build a source from MARKET_DATA_SOURCE: ``coingecko`` or ``file:<path>``."""
+    if spec == "coingecko":
+        return CoinGeckoSource()
+    if spec.startswith("file:"):
+        return FileSource(spec[len("file:"):])
+    raise ValueError(f"Unknown market data source: {spec}")
+
+
+# -------------------- INGESTION --------------------
+
+class Ingestor:
+    """Polls a market data source and writes each tick in a single transaction."""
+
+    def __init__(self, source, interval=60):
+        self.source = source
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def tick(self, quotes=None, recorded_at=None):
+        """Upsert coin prices and append PriceHistory for one snapshot; returns {symbol: id}."""
+        if quotes is None:
+            quotes = self.source.fetch()
+        recorded_at = recorded_at or datetime.datetime.utcnow()
+
+        # One query resolves every symbol instead of a lookup per coin
+        known, names = {}, {}
+        for symbol, coin_id, price, name in db.session.query(
+            Cryptocurrency.symbol, Cryptocurrency.id, Cryptocurrency.market_price, Cryptocurrency.name
+        ):
+            known[symbol] = (coin_id, price)
+            names[coin_id] = name
+
+        created = {}
+        for quote in quotes:
+            if quote.symbol not in known and quote.symbol not in created:
+                created[quote.symbol] = Cryptocurrency(
+                    name=quote.name, symbol=quote.symbol, market_price=quote.price,
+                    market_cap=quote.market_cap, logo_url=quote.logo_url, price_change_24h=quote.change_24h,
+                    volume_24h=quote.volume,
+                )
+        if created:
+            db.session.add_all(created.values())
+            db.session.flush()
+            for symbol, coin in created.items():
+                known[symbol] = (coin.id, None)
+
+        updates, ticks, renamed, seen = [], [], [], set()
+        for quote in quotes:
+            coin_id = known[quote.symbol][0]
+            if coin_id in seen:
+                continue
+            seen.add(coin_id)
+            if coin_id in names and names[coin_id] != quote.name:
+                renamed.append(coin_id)
+            updates.append({
+                "id": coin_id, "name": quote.name, "market_price": quote.price,
+                "market_cap": quote.market_cap, "logo_url": quote.logo_url,
+                "price_change_24h": quote.change_24h, "volume_24h": quote.volume,
+            })
+            ticks.append((coin_id, recorded_at, quote.price, quote.volume))
+
+        db.session.bulk_update_mappings(Cryptocurrency, updates)
+        db.session.bulk_insert_mappings(PriceHistory, [
+            {"cryptocurrency_id": coin_id, "price": price, "recorded_at": at}
+            for coin_id, at, price, _ in ticks
+        ])
+        # A rolling 24h volume summed per bucket means nothing, so candles get none
+        rollups.apply_ticks([(coin_id, at, price, None) for coin_id, at, price, _ in ticks])
+        db.session.commit()
+
+        prices_committed.send(
+            self,
+            ticks=ticks,
+            previous={coin_id: price for coin_id, price in known.values() if price is not None},
+            created=[coin.id for coin in created.values()],
+            renamed=renamed,
+        )
+        return {symbol: ids[0] for symbol, ids in known.items()}
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Market data ingestion tick failed")
+            finally:
+                db.session.remove()
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_background(app):
+    """Run the configured ingestor on a daemon thread inside ``app``'s context."""
+    ingestor = Ingestor(
+        source_from_config(app.config["MARKET_DATA_SOURCE"]),
+        interval=app.config["INGEST_INTERVAL"],
+    )
+
+    def run():
+        with app.app_context():
+            ingestor.run_forever()
+
+    threading.Thread(target=run, name="market-data-ingestor", daemon=True).start()
+    return ingestor
+
+
+if __name__ == '__main__':
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Poll market data and ingest prices on a schedule")
+    parser.add_argument("--source", default=app.config["MARKET_DATA_SOURCE"], help="coingecko or file:<path>")
+    parser.add_argument("--interval", type=float, default=app.config["INGEST_INTERVAL"], help="seconds between ticks")
+    parser.add_argument("--once", action="store_true", help="ingest a single tick and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with app.app_context():
+        ingestor = Ingestor(source_from_config(args.source), interval=args.interval)
+        if args.once:
+            ingestor.tick()
+        else:
+            try:
+                ingestor.run_forever()
+            except KeyboardInterrupt:
+                ingestor.stop()
@@ -0,0 +1,246 @@
+# metrics.py
+import bisect
+import contextvars
+import logging
+import threading
+import time
+
+from flask import current_app, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Statements kept per request for the slow-request log
+MAX_LOGGED_STATEMENTS = 50
+MAX_STATEMENT_LENGTH = 500
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Bucket counts, sum and count for one label set."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Family:
+    """A named metric with a fixed set of labels; samples are keyed by label values."""
+
+    def __init__(self, name, help, kind, labels=(), buckets=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.buckets = buckets
+        # Unlabelled counters and gauges are exported as 0 before their first update
+        self.samples = {} if labels or kind == "histogram" else {(): 0}
+
+    def observe(self, values, amount):
+        sample = self.samples.get(values)
+        if sample is None:
+            sample = self.samples[values] = Histogram(self.buckets)
+        sample.observe(amount)
+
+    def inc(self, values=(), amount=1):
+        self.samples[values] = self.samples.get(values, 0) + amount
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for values, sample in sorted(self.samples.items()):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_labels(self.labels, values)} {_number(sample)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), sample.counts):
+                cumulative += count
+                le = _labels(self.labels + ("le",), values + (_number(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {_number(sample.sum)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {sample.count}")
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class RequestStats:
+    """What one request has done so far; SQL events add to the request running in their context."""
+
+    __slots__ = ("started", "statements", "sql_seconds", "queries", "status", "size")
+
+    def __init__(self, capture):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.queries = [] if capture else None
+        self.status = None
+        self.size = None
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class Metrics:
+    """Per-process request and SQL metrics, rendered in the Prometheus text format.
+
+    Latency, response size and per-request statement count/time are
+    histograms labelled by URL rule (not path, to keep label sets bounded);
+    statements outside any request, e.g. from ingestion, count towards the
+    process totals only. Each worker process keeps its own numbers, so
+    scrape every worker or aggregate them upstream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.slow_request_seconds = 0.0
+        self.requests = Family(
+            "http_requests_total", "Requests served, by route, method and status.", "counter",
+            ("endpoint", "method", "status"))
+        self.latency = Family(
+            "http_request_duration_seconds", "Time from request start to response, by route.", "histogram",
+            ("endpoint", "method"), LATENCY_BUCKETS)
+        self.sizes = Family(
+            "http_response_size_bytes", "Response body size as sent, by route.", "histogram",
+            ("endpoint", "method"), SIZE_BUCKETS)
+        self.in_flight = Family(
+            "http_requests_in_flight", "Requests currently being handled, by route.", "gauge", ("endpoint",))
+        self.request_statements = Family(
+            "http_request_sql_statements", "SQL statements issued per request, by route.", "histogram",
+            ("endpoint",), STATEMENT_BUCKETS)
+        self.request_sql_seconds = Family(
+            "http_request_sql_duration_seconds", "Time spent in SQL per request, by route.", "histogram",
+            ("endpoint",), LATENCY_BUCKETS)
+        self.statements = Family("db_statements_total", "SQL statements executed by this process.", "counter")
+        self.sql_seconds = Family("db_statement_duration_seconds_total", "Time spent executing SQL.", "counter")
+        self.families = [
+            self.requests, self.latency, self.sizes, self.in_flight, self.request_statements,
+            self.request_sql_seconds, self.statements, self.sql_seconds,
+        ]
+
+    # -------------------- SQL --------------------
+
+    # The start time lives on the statement's execution context, which is discarded
+    # with it, so a statement that fails before after_cursor_execute leaves nothing behind
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        with self._lock:
+            self.statements.inc()
+            self.sql_seconds.inc(amount=elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+            if stats.queries is not None and len(stats.queries) < MAX_LOGGED_STATEMENTS:
+                stats.queries.append((elapsed, " ".join(statement.split())[:MAX_STATEMENT_LENGTH]))
+
+    def instrument(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # -------------------- REQUESTS --------------------
+
+    def _endpoint(self):
+        return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+    def before_request(self):
+        request.environ["metrics.token"] = _current.set(RequestStats(capture=self.slow_request_seconds > 0))
+        with self._lock:
+            self.in_flight.inc((self._endpoint(),))
+
+    def after_request(self, response):
+        stats = _current.get()
+        if stats is not None:
+            stats.status = response.status_code
+            # Streamed bodies have no length up front and must not be consumed here (that
+            # would buffer an event stream forever); they are left out of the size histogram
+            stats.size = None if response.is_streamed else response.calculate_content_length()
+        return response
+
+    def teardown_request(self, exc):
+        token = request.environ.pop("metrics.token", None)
+        if token is None:
+            return
+        stats = _current.get()
+        _current.reset(token)
+        elapsed = time.perf_counter() - stats.started
+        endpoint, method = self._endpoint(), request.method
+        status = stats.status or 500
+        with self._lock:
+            self.in_flight.inc((endpoint,), -1)
+            self.requests.inc((endpoint, method, str(status)))
+            self.latency.observe((endpoint, method), elapsed)
+            if stats.size is not None:
+                self.sizes.observe((endpoint, method), stats.size)
+            self.request_statements.observe((endpoint,), stats.statements)
+            self.request_sql_seconds.observe((endpoint,), stats.sql_seconds)
+        if 0 < self.slow_request_seconds <= elapsed:
+            self._log_slow(method, status, elapsed, stats)
+
+    def _log_slow(self, method, status, elapsed, stats):
+        queries = "".join(f"\n  {seconds * 1e3:8.2f} ms  {statement}" for seconds, statement in stats.queries)
+        if stats.statements > len(stats.queries):
+            queries += f"\n  ... {stats.statements - len(stats.queries)} more"
+        logger.warning(
+            "Slow request: %s %s -> %s in %.1f ms, %d SQL statements (%.1f ms)%s",
+            method, request.full_path.rstrip("?"), status, elapsed * 1e3,
+            stats.statements, stats.sql_seconds * 1e3, queries,
+        )
+
+    # -------------------- EXPOSITION --------------------
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for family in self.families:
+                family.render(lines)
+        return "\n".join(lines) + "\n"
+
+
+registry = Metrics()
+
+
+def metrics_view():
+    return current_app.response_class(registry.render(), content_type=CONTENT_TYPE)
+
+
+def init_app(app, db):
+    """Time every request and SQL statement; serve the results on METRICS_PATH."""
+    if not app.config["METRICS_ENABLED"]:
+        return
+    registry.slow_request_seconds = app.config["SLOW_REQUEST_MS"] / 1000
+    app.before_request(registry.before_request)
+    app.after_request(registry.after_request)
+    app.teardown_request(registry.teardown_request)
+    with app.app_context():
+        for engine in db.engines.values():
+            registry.instrument(engine)
+    app.add_url_rule(app.config["METRICS_PATH"], "metrics", metrics_view)
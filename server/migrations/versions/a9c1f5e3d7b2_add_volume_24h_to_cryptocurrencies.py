@@ -0,0 +1,37 @@
+"""Keep the rolling 24h volume on cryptocurrencies instead of in candle volume
+
+Revision ID: a9c1f5e3d7b2
+Revises: d5a2c8e4f1b6
+Create Date: 2026-10-18 21:04:12.518330
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c1f5e3d7b2'
+down_revision = 'd5a2c8e4f1b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cryptocurrencies', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('volume_24h', sa.Numeric(precision=28, scale=8), nullable=True))
+
+    # Candle volume summed each tick's rolling 24h figure; the latest hourly candle's
+    # average is the last reported 24h volume, and the sums themselves are discarded
+    op.execute(
+        "UPDATE cryptocurrencies SET volume_24h = ("
+        "SELECT volume / tick_count FROM price_candles "
+        "WHERE price_candles.cryptocurrency_id = cryptocurrencies.id "
+        "AND resolution = '1h' AND tick_count > 0 "
+        "ORDER BY bucket_start DESC LIMIT 1)"
+    )
+    op.execute("UPDATE price_candles SET volume = 0")
+
+
+def downgrade():
+    with op.batch_alter_table('cryptocurrencies', schema=None) as batch_op:
+        batch_op.drop_column('volume_24h')
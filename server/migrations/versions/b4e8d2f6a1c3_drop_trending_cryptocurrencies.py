@@ -0,0 +1,31 @@
+"""Drop trending_cryptocurrencies; rankings are computed in memory by trending.py
+
+Revision ID: b4e8d2f6a1c3
+Revises: a9c1f5e3d7b2
+Create Date: 2026-10-18 21:37:05.264117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8d2f6a1c3'
+down_revision = 'a9c1f5e3d7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_table('trending_cryptocurrencies')
+
+
+def downgrade():
+    op.create_table('trending_cryptocurrencies',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cryptocurrency_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['cryptocurrency_id'], ['cryptocurrencies.id'], name=op.f('fk_trending_cryptocurrencies_cryptocurrency_id_cryptocurrencies')),
+    sa.PrimaryKeyConstraint('id')
+    )
@@ -0,0 +1,33 @@
+"""Make the price_history (cryptocurrency_id, recorded_at) index unique
+
+Revision ID: d5a2c8e4f1b6
+Revises: b8e3d5f1a7c2
+Create Date: 2026-10-18 18:21:47.093514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a2c8e4f1b6'
+down_revision = 'b8e3d5f1a7c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the first row stored for any duplicated (coin, timestamp) pair
+    op.execute(
+        "DELETE FROM price_history WHERE id NOT IN ("
+        "SELECT MIN(id) FROM price_history GROUP BY cryptocurrency_id, recorded_at)"
+    )
+    with op.batch_alter_table('price_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_price_history_cryptocurrency_id_recorded_at')
+        batch_op.create_index('ix_price_history_cryptocurrency_id_recorded_at', ['cryptocurrency_id', 'recorded_at'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('price_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_price_history_cryptocurrency_id_recorded_at')
+        batch_op.create_index('ix_price_history_cryptocurrency_id_recorded_at', ['cryptocurrency_id', 'recorded_at'], unique=False)
@@ -1,6 +1,6 @@
 # models.py
 from config import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hasher
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -12,12 +12,16 @@ class User(db.Model):
 
     # Relationship with user cryptocurrencies
     cryptocurrencies = db.relationship('UserCryptocurrency', back_populates='user', cascade='all, delete-orphan')
+    alert_triggers = db.relationship('AlertTrigger', back_populates='user', cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {"id": self.id, "username": self.username, "email": self.email}
@@ -34,12 +38,23 @@ class Cryptocurrency(db.Model):
     market_price = db.Column(db.Numeric(20, 8), nullable=False)
     market_cap = db.Column(db.Numeric(20, 2), nullable=True)
     logo_url = db.Column(db.String(255))
+    # Percent change over the last 24h as reported by the market data source
+    price_change_24h = db.Column(db.Numeric(12, 4), nullable=True)
+    # Rolling 24h trading volume as reported by the market data source
+    volume_24h = db.Column(db.Numeric(28, 8), nullable=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    # Sorted catalog pages walk these instead of sorting the table
+    __table_args__ = (
+        db.Index('ix_cryptocurrencies_market_cap', 'market_cap'),
+        db.Index('ix_cryptocurrencies_market_price', 'market_price'),
+        db.Index('ix_cryptocurrencies_price_change_24h', 'price_change_24h'),
+    )
+
     # Relationships
     user_associations = db.relationship('UserCryptocurrency', back_populates='cryptocurrency', cascade='all, delete-orphan')
     price_history = db.relationship('PriceHistory', back_populates='cryptocurrency', cascade='all, delete-orphan')
-    trending_entries = db.relationship('TrendingCryptocurrency', back_populates='cryptocurrency', cascade='all, delete-orphan')
+    candles = db.relationship('PriceCandle', back_populates='cryptocurrency', cascade='all, delete-orphan')
 
     def to_dict(self):
         return {
@@ -48,7 +63,8 @@ class Cryptocurrency(db.Model):
             "symbol": self.symbol,
             "market_price": float(self.market_price),
             "market_cap": float(self.market_cap) if self.market_cap is not None else 0.00,
-            "logo_url": self.logo_url
+            "logo_url": self.logo_url,
+            "price_change_24h": float(self.price_change_24h) if self.price_change_24h is not None else None
         }
 
 class UserCryptocurrency(db.Model):
@@ -58,6 +74,16 @@ class UserCryptocurrency(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     cryptocurrency_id = db.Column(db.Integer, db.ForeignKey('cryptocurrencies.id'), nullable=False)
     alert_price = db.Column(db.Numeric(20, 8), nullable=False)
+    # Holdings: units owned and the total amount paid for them
+    quantity = db.Column(db.Numeric(28, 8), nullable=False, default=0, server_default='0')
+    cost_basis = db.Column(db.Numeric(28, 8), nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    # Watchlist-add velocity for trending counts recent rows through ix_..._created_at
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'cryptocurrency_id', name='uq_user_cryptocurrencies_user_id_cryptocurrency_id'),
+        db.Index('ix_user_cryptocurrencies_created_at', 'created_at'),
+    )
 
     # Relationships
     user = db.relationship('User', back_populates='cryptocurrencies')
@@ -68,7 +94,9 @@ class UserCryptocurrency(db.Model):
             "id": self.id,
             "user_id": self.user_id,
             "cryptocurrency_id": self.cryptocurrency_id,
-            "alert_price": float(self.alert_price)
+            "alert_price": float(self.alert_price),
+            "quantity": float(self.quantity or 0),
+            "cost_basis": float(self.cost_basis or 0)
         }
 
 class PriceHistory(db.Model):
@@ -79,16 +107,63 @@ class PriceHistory(db.Model):
     price = db.Column(db.Numeric(20, 8), nullable=False)
     recorded_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
 
+    # Keyset pagination and range scans on the history endpoint walk this index;
+    # it is unique so re-running a backfill skips rows that are already stored
+    __table_args__ = (
+        db.Index('ix_price_history_cryptocurrency_id_recorded_at', 'cryptocurrency_id', 'recorded_at', unique=True),
+    )
+
     # Relationship
     cryptocurrency = db.relationship('Cryptocurrency', back_populates='price_history')
 
-class TrendingCryptocurrency(db.Model):
-    __tablename__ = 'trending_cryptocurrencies'
+class PriceCandle(db.Model):
+    __tablename__ = 'price_candles'
 
     id = db.Column(db.Integer, primary_key=True)
     cryptocurrency_id = db.Column(db.Integer, db.ForeignKey('cryptocurrencies.id'), nullable=False)
-    rank = db.Column(db.Integer, nullable=False)
-    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    resolution = db.Column(db.String(4), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    open = db.Column(db.Numeric(20, 8), nullable=False)
+    high = db.Column(db.Numeric(20, 8), nullable=False)
+    low = db.Column(db.Numeric(20, 8), nullable=False)
+    close = db.Column(db.Numeric(20, 8), nullable=False)
+    volume = db.Column(db.Numeric(28, 8), nullable=False, default=0)
+    tick_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('cryptocurrency_id', 'resolution', 'bucket_start', name='uq_price_candles_coin_resolution_bucket'),
+    )
 
     # Relationship
-    cryptocurrency = db.relationship('Cryptocurrency', back_populates='trending_entries')
+    cryptocurrency = db.relationship('Cryptocurrency', back_populates='candles')
+
+class AlertTrigger(db.Model):
+    __tablename__ = 'alert_triggers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    cryptocurrency_id = db.Column(db.Integer, db.ForeignKey('cryptocurrencies.id'), nullable=False)
+    alert_price = db.Column(db.Numeric(20, 8), nullable=False)
+    price_before = db.Column(db.Numeric(20, 8), nullable=False)
+    price_after = db.Column(db.Numeric(20, 8), nullable=False)
+    direction = db.Column(db.String(4), nullable=False)
+    triggered_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_alert_triggers_user_id_triggered_at', 'user_id', 'triggered_at'),
+    )
+
+    # Relationships
+    user = db.relationship('User', back_populates='alert_triggers')
+    cryptocurrency = db.relationship('Cryptocurrency')
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "cryptocurrency_id": self.cryptocurrency_id,
+            "alert_price": float(self.alert_price),
+            "price_before": float(self.price_before),
+            "price_after": float(self.price_after),
+            "direction": self.direction,
+            "triggered_at": self.triggered_at.isoformat()
+        }
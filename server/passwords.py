@@ -0,0 +1,78 @@
+# passwords.py
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated and the caller should back off."""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with a configurable method and execution mode.
+
+    ``inline`` runs on the request thread. ``thread`` and ``process`` run on a
+    bounded pool; at most ``workers + max_pending`` hashes may be in flight, and
+    a request that cannot get a slot within ``queue_timeout`` seconds gets
+    ``HashingBusy`` instead of tying up a WSGI worker behind a login storm.
+    """
+
+    def __init__(self, method="pbkdf2:sha256:600000", executor="inline", workers=4, max_pending=16, queue_timeout=1.0):
+        self.configure(method, executor, workers, max_pending, queue_timeout)
+
+    def configure(self, method, executor, workers, max_pending, queue_timeout):
+        if executor not in ("inline", "thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        self.method = method
+        self.executor = executor
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._prefix = None
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                pool_class = ThreadPoolExecutor if self.executor == "thread" else ProcessPoolExecutor
+                self._pool = pool_class(max_workers=self.workers)
+            return self._pool
+
+    def _run(self, fn, *args):
+        if self.executor == "inline":
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy()
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        # Stored hashes look like "<method>$<salt>$<hash>", with the method spelled out
+        # in full ("scrypt" is stored as "scrypt:32768:8:1"), so compare against the
+        # prefix of a hash actually made with the configured method, computed once
+        if self._prefix is None:
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._prefix
+
+
+hasher = PasswordHasher()
+
+
+def init_app(app):
+    hasher.configure(
+        method=app.config["PASSWORD_HASH_METHOD"],
+        executor=app.config["PASSWORD_HASH_EXECUTOR"],
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+        queue_timeout=app.config["PASSWORD_HASH_QUEUE_TIMEOUT"],
+    )
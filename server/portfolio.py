@@ -0,0 +1,199 @@
+# portfolio.py
+import datetime
+
+import numpy as np
+from sqlalchemy import Float, and_, select, type_coerce
+
+import history
+import rollups
+from models import db, Cryptocurrency, PriceCandle, UserCryptocurrency
+
+
+def _candle_close_at(at):
+    """Correlated subquery: close of the last hourly candle starting at or before ``at``."""
+    return (
+        select(type_coerce(PriceCandle.close, Float))
+        .where(
+            PriceCandle.cryptocurrency_id == UserCryptocurrency.cryptocurrency_id,
+            PriceCandle.resolution == "1h",
+            PriceCandle.bucket_start <= at,
+        )
+        .order_by(PriceCandle.bucket_start.desc())
+        .limit(1)
+        .correlate(UserCryptocurrency)
+        .scalar_subquery()
+    )
+
+
+def valuation(user_id, now=None):
+    """Current value, 24h change and unrealized P&L of every holding, plus totals.
+
+    Quantities, cost bases, current prices and prices 24h ago come back from a
+    single query; every figure is then computed with array arithmetic.
+    """
+    now = now or datetime.datetime.utcnow()
+    rows = (
+        db.session.query(
+            UserCryptocurrency.cryptocurrency_id,
+            Cryptocurrency.symbol,
+            type_coerce(UserCryptocurrency.quantity, Float),
+            type_coerce(UserCryptocurrency.cost_basis, Float),
+            type_coerce(Cryptocurrency.market_price, Float),
+            _candle_close_at(now - datetime.timedelta(hours=24)),
+        )
+        .join(Cryptocurrency, Cryptocurrency.id == UserCryptocurrency.cryptocurrency_id)
+        .filter(UserCryptocurrency.user_id == user_id)
+        .order_by(UserCryptocurrency.cryptocurrency_id.asc())
+        .all()
+    )
+    if not rows:
+        return {"positions": [], "totals": _totals(0.0, 0.0, 0.0, 0.0)}
+
+    coin_ids, symbols, quantity, cost, price, price_24h = zip(*rows)
+    # None (no candle 24h back) becomes NaN
+    quantity, cost, price, price_24h = (
+        np.array(column, dtype=np.float64) for column in (quantity, cost, price, price_24h)
+    )
+
+    value = quantity * price
+    # Coins without a candle 24h back contribute no change rather than NaN
+    change_24h = np.where(np.isnan(price_24h), 0.0, quantity * (price - price_24h))
+    pnl = value - cost
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pnl_pct = np.where(cost > 0, pnl / cost * 100, np.nan)
+
+    positions = [
+        {
+            "cryptocurrency_id": coin_id,
+            "symbol": symbol,
+            "quantity": q,
+            "price": p,
+            "value": v,
+            "cost_basis": c,
+            "change_24h": ch,
+            "unrealized_pnl": pl,
+            "unrealized_pnl_pct": None if np.isnan(pct) else pct,
+        }
+        for coin_id, symbol, q, p, v, c, ch, pl, pct in zip(
+            coin_ids, symbols, quantity.tolist(), price.tolist(), value.tolist(), cost.tolist(),
+            change_24h.tolist(), pnl.tolist(), pnl_pct.tolist(),
+        )
+    ]
+    return {
+        "positions": positions,
+        "totals": _totals(value.sum(), change_24h.sum(), cost.sum(), pnl.sum()),
+    }
+
+
+def _totals(value, change_24h, cost, pnl):
+    previous = value - change_24h
+    return {
+        "value": float(value),
+        "change_24h": float(change_24h),
+        "change_24h_pct": float(change_24h / previous * 100) if previous else None,
+        "cost_basis": float(cost),
+        "unrealized_pnl": float(pnl),
+        "unrealized_pnl_pct": float(pnl / cost * 100) if cost else None,
+    }
+
+
+def value_curve(user_id, seconds, start, end):
+    """Portfolio value at the close of each ``seconds`` bucket in [start, end).
+
+    Candles for every held coin are read from the coarsest rollup that tiles
+    the bucket size, scattered into a coins x buckets matrix, forward-filled
+    and reduced against the quantity vector in one matrix product.
+    """
+    start = history.bucket_start(start, seconds)
+    buckets = -(-int((end - start).total_seconds()) // seconds)
+    if buckets <= 0:
+        return []
+    if buckets > history.MAX_LIMIT:
+        raise ValueError(f"Range too long for this resolution (max {history.MAX_LIMIT} points)")
+
+    holdings = (
+        db.session.query(UserCryptocurrency.cryptocurrency_id, type_coerce(UserCryptocurrency.quantity, Float))
+        .filter(UserCryptocurrency.user_id == user_id)
+        .order_by(UserCryptocurrency.cryptocurrency_id.asc())
+        .all()
+    )
+    if not holdings:
+        return []
+    coin_ids, quantity = zip(*holdings)
+    coins = np.array(coin_ids, dtype=np.int64)
+    quantity = np.array(quantity, dtype=np.float64)
+    rollup = rollups.rollup_for(seconds)
+
+    # Last close before the range seeds the forward fill
+    seed = _seed_closes(coins, rollup, start)
+
+    candles = (
+        db.session.query(PriceCandle.cryptocurrency_id, PriceCandle.bucket_start, type_coerce(PriceCandle.close, Float))
+        .filter(
+            PriceCandle.cryptocurrency_id.in_(coin_ids),
+            PriceCandle.resolution == rollup,
+            PriceCandle.bucket_start >= start,
+            PriceCandle.bucket_start < end,
+        )
+        .order_by(PriceCandle.bucket_start.asc())
+        .all()
+    )
+
+    matrix = np.full((len(coins), buckets + 1), np.nan)
+    matrix[:, 0] = seed
+    if candles:
+        candle_coins, times, closes = zip(*candles)
+        rows_idx = np.searchsorted(coins, np.array(candle_coins, dtype=np.int64))
+        cols = (np.array(times, dtype="datetime64[s]") - np.datetime64(start, "s")) // np.timedelta64(seconds, "s") + 1
+        closes = np.array(closes, dtype=np.float64)
+        # Candles arrive in time order, so keep the last one landing in each cell
+        flat = rows_idx * (buckets + 1) + cols
+        _, last_reversed = np.unique(flat[::-1], return_index=True)
+        keep = len(flat) - 1 - last_reversed
+        matrix[rows_idx[keep], cols[keep]] = closes[keep]
+
+    # Forward fill along time: carry each coin's last known close into empty buckets
+    filled_at = np.where(np.isnan(matrix), 0, np.arange(buckets + 1))
+    np.maximum.accumulate(filled_at, axis=1, out=filled_at)
+    matrix = matrix[np.arange(len(coins))[:, None], filled_at]
+    values = quantity @ np.nan_to_num(matrix[:, 1:], nan=0.0)
+    times = np.datetime64(start, "s") + np.arange(buckets) * np.timedelta64(seconds, "s")
+
+    return [
+        {"recorded_at": recorded_at, "value": value}
+        for recorded_at, value in zip(times.astype(str).tolist(), values.tolist())
+    ]
+
+
+def _seed_closes(coins, rollup, start):
+    """Each coin's last rollup close before ``start`` (NaN if none), in one query.
+
+    ``coins`` is a sorted array of coin ids; the result lines up with it.
+    """
+    latest = (
+        select(PriceCandle.bucket_start)
+        .where(
+            PriceCandle.cryptocurrency_id == Cryptocurrency.id,
+            PriceCandle.resolution == rollup,
+            PriceCandle.bucket_start < start,
+        )
+        .order_by(PriceCandle.bucket_start.desc())
+        .limit(1)
+        .correlate(Cryptocurrency)
+        .scalar_subquery()
+    )
+    rows = (
+        db.session.query(Cryptocurrency.id, type_coerce(PriceCandle.close, Float))
+        .join(PriceCandle, and_(
+            PriceCandle.cryptocurrency_id == Cryptocurrency.id,
+            PriceCandle.resolution == rollup,
+            PriceCandle.bucket_start == latest,
+        ))
+        .filter(Cryptocurrency.id.in_(coins.tolist()))
+        .all()
+    )
+    seed = np.full(len(coins), np.nan)
+    if rows:
+        seeded, closes = zip(*rows)
+        seed[np.searchsorted(coins, np.array(seeded, dtype=np.int64))] = closes
+    return seed
@@ -0,0 +1,201 @@
+# pubsub.py
+import datetime
+import logging
+import threading
+import time
+
+from sqlalchemy import func
+
+from models import db, Cryptocurrency, PriceHistory
+from serialization import dumps
+from signals import prices_committed
+
+logger = logging.getLogger(__name__)
+
+# Most price_history rows one relay poll reads
+RELAY_BATCH = 10_000
+
+
+class Subscriber:
+    """One streaming connection's pending events, coalesced per coin.
+
+    A slow client never makes the buffer grow past one event per coin: a new
+    price for a coin replaces any unsent one, so backpressure costs only
+    intermediate prices, never memory or the publisher's time.
+    """
+
+    def __init__(self, coin_ids=None):
+        self.coin_ids = frozenset(coin_ids) if coin_ids is not None else None
+        self.pending = {}
+        self.dropped = 0
+        self.closed = False
+        self._ready = threading.Condition()
+
+    def offer(self, events):
+        with self._ready:
+            for coin_id, frame in events.items():
+                if self.coin_ids is None or coin_id in self.coin_ids:
+                    if coin_id in self.pending:
+                        self.dropped += 1
+                    self.pending[coin_id] = frame
+            if self.pending:
+                self._ready.notify()
+
+    def drain(self, timeout):
+        """Wait up to ``timeout`` seconds and return the pending frames (possibly none)."""
+        with self._ready:
+            if not self.pending and not self.closed:
+                self._ready.wait(timeout)
+            frames, self.pending = list(self.pending.values()), {}
+        return frames
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+
+
+class Broker:
+    """Fan-out of price deltas: each is encoded once and shared by every subscriber.
+
+    Ticks ingested in this process arrive through ``prices_committed``. Ticks
+    committed by other processes (``python ingest.py``, other workers) are
+    picked up by a relay thread that polls price_history for new rows every
+    ``poll_interval`` seconds while anyone is subscribed. A tick seen both ways,
+    or one older than the last published for its coin (a backfill), is sent
+    once or not at all.
+    """
+
+    def __init__(self, max_subscribers=500, poll_interval=1.0):
+        self.max_subscribers = max_subscribers
+        self.poll_interval = poll_interval
+        self.app = None
+        self.subscribers = set()
+        self.latest = {}
+        self.prices = {}
+        self.since = datetime.datetime.min
+        self._relay = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, coin_ids=None):
+        """Register a subscriber; returns None when the connection limit is reached."""
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(coin_ids)
+            self.subscribers.add(subscriber)
+            if self._relay is None and self.app is not None and self.poll_interval > 0:
+                self._relay = threading.Thread(target=self._run_relay, name="price-stream-relay", daemon=True)
+                self._relay.start()
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, events):
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(events)
+
+    def publish_ticks(self, ticks, previous):
+        """Publish the ticks newer than the last one sent for their coin."""
+        fresh = []
+        with self._lock:
+            for tick in ticks:
+                coin_id, recorded_at, price = tick[0], tick[1], tick[2]
+                if recorded_at <= self.latest.get(coin_id, self.since):
+                    continue
+                self.latest[coin_id] = recorded_at
+                self.prices[coin_id] = price
+                fresh.append(tick)
+        if fresh:
+            self.publish(encode_price_events(fresh, previous))
+
+    # -------------------- RELAY --------------------
+
+    def _poll(self, last_id):
+        rows = (
+            db.session.query(PriceHistory.id, PriceHistory.cryptocurrency_id, PriceHistory.recorded_at, PriceHistory.price)
+            .filter(PriceHistory.id > last_id)
+            .order_by(PriceHistory.id)
+            .limit(RELAY_BATCH)
+            .all()
+        )
+        if not rows:
+            return last_id
+        with self._lock:
+            previous = {row[1]: self.prices.get(row[1]) for row in rows}
+        self.publish_ticks([(coin_id, at, price, None) for _, coin_id, at, price in rows], previous)
+        return rows[-1][0]
+
+    def _run_relay(self):
+        """Poll for ticks committed elsewhere until the last subscriber leaves."""
+        with self.app.app_context():
+            try:
+                last_id = db.session.query(func.max(PriceHistory.id)).scalar() or 0
+                with self._lock:
+                    # A tick recorded before the relay started is not news, but one
+                    # committed just after it may carry a slightly earlier timestamp
+                    self.since = max(self.since, datetime.datetime.utcnow() - datetime.timedelta(seconds=self.poll_interval))
+                    for coin_id, price in db.session.query(Cryptocurrency.id, Cryptocurrency.market_price):
+                        self.prices.setdefault(coin_id, price)
+            finally:
+                db.session.remove()
+            while True:
+                time.sleep(self.poll_interval)
+                with self._lock:
+                    if not self.subscribers:
+                        self._relay = None
+                        return
+                try:
+                    last_id = self._poll(last_id)
+                except Exception:
+                    logger.exception("Price stream relay poll failed")
+                finally:
+                    # Never hold a read transaction open between polls
+                    db.session.remove()
+
+    def stream(self, subscriber, heartbeat=15):
+        """Yield server-sent event bytes for ``subscriber`` until the client goes away."""
+        try:
+            yield b"retry: 5000\n\n"
+            last_write = time.monotonic()
+            while not subscriber.closed:
+                frames = subscriber.drain(heartbeat)
+                if frames:
+                    yield b"".join(frames)
+                    last_write = time.monotonic()
+                elif time.monotonic() - last_write >= heartbeat:
+                    # Comment lines keep proxies from timing out idle connections
+                    yield b": keepalive\n\n"
+                    last_write = time.monotonic()
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def encode_price_events(ticks, previous):
+    """Build one SSE frame per coin from an ingestion tick."""
+    events = {}
+    for coin_id, recorded_at, price, _ in ticks:
+        before = previous.get(coin_id)
+        payload = {
+            "id": coin_id,
+            "market_price": float(price),
+            "previous_price": float(before) if before is not None else None,
+            "change": float((price - before) / before) if before else None,
+            "recorded_at": recorded_at.isoformat(),
+        }
+        events[coin_id] = b"event: price\ndata: " + dumps(payload) + b"\n\n"
+    return events
+
+
+broker = Broker()
+
+
+@prices_committed.connect
+def _on_prices_committed(sender, ticks, previous, **kwargs):
+    if broker.subscribers:
+        broker.publish_ticks(ticks, previous)
@@ -0,0 +1,234 @@
+# ratelimit.py
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# Tokens a request to each endpoint spends; unlisted endpoints cost 1, and a cost of 0
+# exempts an endpoint from both rate limiting and load shedding
+DEFAULT_COSTS = {
+    "metrics": 0,
+    "routes.login": 20,
+    "routes.register": 20,
+    "routes.get_correlation": 10,
+    "routes.get_price_history": 5,
+    "routes.get_portfolio_history": 5,
+    "routes.get_indicators": 3,
+    "routes.get_cryptocurrencies": 2,
+    "routes.search_cryptocurrencies": 2,
+}
+
+
+def parse_costs(spec):
+    """``"routes.login=20,routes.get_price_history=5"`` -> {endpoint: cost}."""
+    costs = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, cost = item.partition("=")
+        costs[endpoint.strip()] = float(cost)
+    return costs
+
+
+def queue_seconds(header, now=None):
+    """Seconds since a proxy's ``X-Request-Start`` stamp, or None if there is none.
+
+    Accepts ``t=<stamp>`` or a bare stamp in seconds, milliseconds or
+    microseconds since the epoch (nginx, Heroku and HAProxy setups differ).
+    """
+    if not header:
+        return None
+    try:
+        stamp = float(header.strip().lstrip("t="))
+    except ValueError:
+        return None
+    if stamp > 1e14:
+        stamp /= 1e6
+    elif stamp > 1e11:
+        stamp /= 1e3
+    return max(0.0, (time.time() if now is None else now) - stamp)
+
+
+class TokenBuckets:
+    """One token bucket per key, refilled lazily when the key is next seen.
+
+    A bucket holds up to ``burst`` tokens and gains ``rate`` per second. At
+    most ``max_keys`` buckets are kept; the least recently seen are dropped
+    first and start full if their client returns.
+    """
+
+    def __init__(self, rate, burst, max_keys=100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, now=None):
+        """Spend ``cost`` tokens. Returns 0 if allowed, else the seconds until it would be."""
+        now = time.monotonic() if now is None else now
+        # A cost above the burst could never be paid; charge a full bucket instead
+        cost = min(cost, self.burst)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < cost:
+                return (cost - bucket[0]) / self.rate
+            bucket[0] -= cost
+            return 0.0
+
+
+class Limiter:
+    """Per-client token buckets and per-process load shedding, ahead of every view.
+
+    Requests with a valid bearer token spend from their user's bucket and
+    all others from their client IP's, so users behind one NAT do not share
+    a limit once signed in. Each request's cost comes from ``costs`` by
+    endpoint. Separately, a request arriving while ``max_in_flight`` others
+    are in progress in this process, or that waited in the proxy's queue
+    longer than ``max_queue_seconds``, is refused with a 503 before doing any
+    work. Buckets and counts are per worker process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.costs = dict(DEFAULT_COSTS)
+        self.by_ip = None
+        self.by_user = None
+        self.proxy_count = 0
+        self.max_in_flight = 0
+        self.max_queue_seconds = 0.0
+        self.in_flight = 0
+        self._warned_proxy = False
+        # Set by the routes blueprint: returns the user id of the request's bearer token, or None
+        self.identify = None
+
+    def configure(self, costs, ip_rate, ip_burst, user_rate, user_burst, max_keys,
+                  proxy_count, max_in_flight, max_queue_seconds):
+        self.costs = costs
+        self.by_ip = TokenBuckets(ip_rate, ip_burst, max_keys) if ip_rate > 0 else None
+        self.by_user = TokenBuckets(user_rate, user_burst, max_keys) if user_rate > 0 else None
+        self.proxy_count = proxy_count
+        self.max_in_flight = max_in_flight
+        self.max_queue_seconds = max_queue_seconds
+
+    @property
+    def active(self):
+        return (
+            self.by_ip is not None or self.by_user is not None
+            or self.max_in_flight > 0 or self.max_queue_seconds > 0
+        )
+
+    def client_ip(self):
+        # Only the entry appended by the outermost trusted proxy can't be forged by the client
+        if self.proxy_count:
+            forwarded = request.headers.get("X-Forwarded-For", "").split(",")
+            if len(forwarded) >= self.proxy_count and forwarded[-self.proxy_count].strip():
+                return forwarded[-self.proxy_count].strip()
+        elif not self._warned_proxy and "X-Forwarded-For" in request.headers:
+            self._warned_proxy = True
+            logger.error(
+                "Rate limiting by IP behind a proxy with RATE_LIMIT_PROXY_COUNT=0: every client "
+                "shares the proxy's bucket (%s). Set RATE_LIMIT_PROXY_COUNT to the number of proxies.",
+                request.remote_addr,
+            )
+        return request.remote_addr
+
+    # -------------------- REQUESTS --------------------
+
+    def before_request(self):
+        # CORS preflights are answered by flask-cors and cost nothing
+        if request.method == "OPTIONS":
+            return None
+        cost = self.costs.get(request.endpoint, 1)
+        if not cost:
+            return None
+
+        if self.max_queue_seconds:
+            queued = queue_seconds(request.headers.get("X-Request-Start"))
+            if queued is not None and queued > self.max_queue_seconds:
+                return overloaded()
+        if self.max_in_flight:
+            with self._lock:
+                if self.in_flight >= self.max_in_flight:
+                    return overloaded()
+                self.in_flight += 1
+            request.environ["ratelimit.in_flight"] = True
+
+        user_id = self.identify() if self.identify is not None and self.by_user is not None else None
+        if user_id is not None:
+            wait = self.by_user.take(user_id, cost)
+        elif self.by_ip is not None:
+            wait = self.by_ip.take(self.client_ip(), cost)
+        else:
+            wait = 0
+        if wait:
+            self._leave()
+            return too_many_requests(wait)
+        return None
+
+    def _leave(self):
+        if request.environ.pop("ratelimit.in_flight", False):
+            with self._lock:
+                self.in_flight -= 1
+
+    def after_request(self, response):
+        # Released here rather than at teardown so an open event stream does not hold a slot
+        self._leave()
+        return response
+
+    def teardown_request(self, exc):
+        self._leave()
+
+
+def too_many_requests(wait):
+    response = jsonify({"error": "Too many requests, please slow down"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def overloaded():
+    response = jsonify({"error": "Server is busy, please retry shortly"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+limiter = Limiter()
+
+
+def init_app(app):
+    """Rate limit and shed load ahead of every view.
+
+    Call after ``metrics.init_app`` so its before_request hook runs first and
+    rejected requests are still counted.
+    """
+    config = app.config
+    enabled = config["RATE_LIMIT_ENABLED"]
+    limiter.configure(
+        costs=config["RATE_LIMIT_COSTS"],
+        ip_rate=config["RATE_LIMIT_IP_RATE"] if enabled else 0,
+        ip_burst=config["RATE_LIMIT_IP_BURST"],
+        user_rate=config["RATE_LIMIT_USER_RATE"] if enabled else 0,
+        user_burst=config["RATE_LIMIT_USER_BURST"],
+        max_keys=config["RATE_LIMIT_MAX_KEYS"],
+        proxy_count=config["RATE_LIMIT_PROXY_COUNT"],
+        max_in_flight=config["LOAD_SHED_MAX_IN_FLIGHT"],
+        max_queue_seconds=config["LOAD_SHED_MAX_QUEUE_MS"] / 1000,
+    )
+    if not limiter.active:
+        return
+    app.before_request(limiter.before_request)
+    app.after_request(limiter.after_request)
+    app.teardown_request(limiter.teardown_request)
@@ -0,0 +1,342 @@
+# retention.py
+import argparse
+import csv
+import datetime
+import gzip
+import io
+import os
+import threading
+import time
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import func
+
+import cache
+import rollups
+import serialization
+from models import db, Cryptocurrency, PriceCandle, PriceHistory
+
+ARCHIVE_COLUMNS = ("id", "recorded_at", "price")
+
+# Coins archived between manifest writes
+WATERMARK_GROUP = 100
+
+# Config key holding how many days each compacted candle size is kept (0 keeps them all)
+CANDLE_RETENTION = {"1m": "RETENTION_1M_DAYS", "1h": "RETENTION_1H_DAYS"}
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month):
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+# -------------------- ARCHIVE --------------------
+
+class Archive:
+    """Expired raw ticks as one gzipped CSV per coin and calendar month.
+
+    Files live under ``<root>/price_history/<YYYY-MM>/<coin id>.csv.gz`` and
+    keep each tick's id, timestamp and exact price, so archived rows page
+    through /price-history exactly as they did from the table. The manifest
+    records, per coin, the month boundary below which its ticks live here
+    rather than in the database.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.join(root, "price_history")
+        self._manifest = None
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    def path(self, month, coin_id):
+        return os.path.join(self.root, month.strftime("%Y-%m"), f"{coin_id}.csv.gz")
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    def watermarks(self):
+        """{coin id: datetime before which that coin's ticks are archived}, re-read when the file changes."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(self.manifest_path, "rb") as f:
+                    raw = serialization.loads(f.read())
+                self._manifest = {int(k): datetime.datetime.fromisoformat(v) for k, v in raw.items()}
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    def watermark(self, coin_id):
+        return self.watermarks().get(coin_id)
+
+    def set_watermarks(self, updates):
+        manifest = dict(self.watermarks())
+        manifest.update(updates)
+        os.makedirs(self.root, exist_ok=True)
+        _write_atomic(self.manifest_path, serialization.dumps(
+            {str(coin_id): moment.isoformat() for coin_id, moment in sorted(manifest.items())}, pretty=True
+        ))
+
+    def _rows(self, month, coin_id):
+        try:
+            f = gzip.open(self.path(month, coin_id), "rt", newline="")
+        except FileNotFoundError:
+            return
+        with f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row_id, recorded_at, price in reader:
+                yield int(row_id), datetime.datetime.fromisoformat(recorded_at), Decimal(price)
+
+    def write(self, month, coin_id, rows):
+        """Merge ``rows`` into the month's file; ticks already archived win. Returns rows added."""
+        merged = {row[1]: row for row in rows}
+        added = len(merged)
+        for row in self._rows(month, coin_id):
+            if row[1] in merged:
+                added -= 1
+            merged[row[1]] = row
+        if not added:
+            return 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(ARCHIVE_COLUMNS)
+        for row_id, recorded_at, price in sorted(merged.values(), key=lambda r: (r[1], r[0])):
+            writer.writerow((row_id, recorded_at.isoformat(), price))
+        path = self.path(month, coin_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, gzip.compress(buffer.getvalue().encode(), mtime=0))
+        return added
+
+    def read(self, coin_id, start=None, end=None, after=None):
+        """Archived (id, recorded_at, price) of one coin in (recorded_at, id) order.
+
+        ``after`` is a (recorded_at, id) keyset cursor, as on /price-history.
+        Only the months overlapping the range are opened, one at a time.
+        """
+        watermark = self.watermark(coin_id)
+        if watermark is None:
+            return
+        end = min(end, watermark) if end is not None else watermark
+        lower = max(filter(None, (start, after[0] if after else None)), default=None)
+        months = sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []
+        for name in months:
+            if name == "manifest.json":
+                continue
+            month = datetime.datetime.strptime(name, "%Y-%m")
+            if month >= end or (lower is not None and next_month(month) <= lower):
+                continue
+            for row in self._rows(month, coin_id):
+                row_id, recorded_at, _ = row
+                if recorded_at >= end:
+                    return
+                if start is not None and recorded_at < start:
+                    continue
+                if after is not None and (recorded_at, row_id) <= (after[0], after[1] or 0):
+                    continue
+                yield row
+
+
+def _write_atomic(path, data):
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+_archives = {}
+
+
+def archive():
+    """The Archive under the current app's ARCHIVE_DIR."""
+    root = current_app.config["ARCHIVE_DIR"]
+    if root not in _archives:
+        _archives[root] = Archive(root)
+    return _archives[root]
+
+
+def read_ticks(coin_id, start=None, end=None):
+    """(recorded_at, price) of one coin in time order, wherever each tick lives.
+
+    Ticks below the coin's watermark come from the archive and the rest from
+    price_history, the same split /price-history serves.
+    """
+    store = archive()
+    watermark = store.watermark(coin_id)
+    if watermark is not None:
+        for _, recorded_at, price in store.read(coin_id, start, end):
+            yield recorded_at, price
+        start = max(start, watermark) if start is not None else watermark
+    query = db.session.query(PriceHistory.recorded_at, PriceHistory.price).filter(
+        PriceHistory.cryptocurrency_id == coin_id
+    )
+    if start is not None:
+        query = query.filter(PriceHistory.recorded_at >= start)
+    if end is not None:
+        query = query.filter(PriceHistory.recorded_at < end)
+    yield from query.order_by(PriceHistory.recorded_at.asc(), PriceHistory.id.asc()).yield_per(rollups.BULK_CHUNK)
+
+
+# -------------------- RETENTION --------------------
+
+class RetentionStats:
+    __slots__ = ("archived", "purged", "rebuilt", "compacted")
+
+    def __init__(self):
+        self.archived = 0
+        self.purged = 0
+        self.rebuilt = 0
+        self.compacted = 0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _delete_in_batches(model, criteria, batch_size, pause):
+    """Delete matching rows ``batch_size`` at a time, committing after each batch.
+
+    Every batch is its own short write transaction, so API requests and
+    ingestion get the database lock between batches.
+    """
+    deleted = 0
+    while True:
+        ids = [row[0] for row in db.session.query(model.id).filter(*criteria).limit(batch_size)]
+        if not ids:
+            return deleted
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+def _ensure_candles(coin_id, month, end, stats):
+    """Rebuild a coin-month's candles from raw ticks if some ticks never reached them.
+
+    More rolled-up ticks than raw ones means an earlier run was interrupted
+    mid-purge; those candles are the only complete record and are kept.
+    """
+    ticks = db.session.query(func.count()).filter(
+        PriceHistory.cryptocurrency_id == coin_id, PriceHistory.recorded_at >= month, PriceHistory.recorded_at < end,
+    ).scalar()
+    rolled = db.session.query(func.coalesce(func.sum(PriceCandle.tick_count), 0)).filter(
+        PriceCandle.cryptocurrency_id == coin_id, PriceCandle.resolution == rollups.ROLLUPS[-1],
+        PriceCandle.bucket_start >= month, PriceCandle.bucket_start < end,
+    ).scalar()
+    if rolled < ticks:
+        rollups.rebuild([coin_id], start=month, end=end)
+        stats.rebuilt += 1
+
+
+def archive_coin(store, coin_id, boundary, stats):
+    """Copy one coin's ticks before ``boundary`` (a month start) into the archive.
+
+    Month by month, the candles are first checked to cover every tick, then
+    the ticks are merged into that month's file. Returns whether the coin
+    had any such ticks; they stay in the table until ``purge_coin``.
+    """
+    first = db.session.query(func.min(PriceHistory.recorded_at)).filter(
+        PriceHistory.cryptocurrency_id == coin_id
+    ).scalar()
+    if first is None or first >= boundary:
+        return False
+    month = month_start(first)
+    while month < boundary:
+        end = next_month(month)
+        _ensure_candles(coin_id, month, end, stats)
+        rows = (
+            db.session.query(PriceHistory.id, PriceHistory.recorded_at, PriceHistory.price)
+            .filter(
+                PriceHistory.cryptocurrency_id == coin_id,
+                PriceHistory.recorded_at >= month,
+                PriceHistory.recorded_at < end,
+            )
+            .order_by(PriceHistory.recorded_at.asc(), PriceHistory.id.asc())
+            .yield_per(rollups.BULK_CHUNK)
+        )
+        stats.archived += store.write(month, coin_id, rows)
+        month = end
+    return True
+
+
+def purge_coin(coin_id, boundary, batch_size, pause, stats):
+    stats.purged += _delete_in_batches(PriceHistory, (
+        PriceHistory.cryptocurrency_id == coin_id, PriceHistory.recorded_at < boundary,
+    ), batch_size, pause)
+
+
+def compact_candles(coin_id, now, retention_days, batch_size, pause, stats):
+    """Drop candles of each resolution older than its retention; coarser ones remain."""
+    for resolution, days in retention_days.items():
+        if not days:
+            continue
+        stats.compacted += _delete_in_batches(PriceCandle, (
+            PriceCandle.cryptocurrency_id == coin_id,
+            PriceCandle.resolution == resolution,
+            PriceCandle.bucket_start < now - datetime.timedelta(days=days),
+        ), batch_size, pause)
+
+
+def candle_cutoff(resolution, now=None):
+    """Time before which retention may have dropped ``resolution`` candles, or None if it keeps them."""
+    days = current_app.config[CANDLE_RETENTION[resolution]] if resolution in CANDLE_RETENTION else 0
+    if not days:
+        return None
+    return (now or datetime.datetime.utcnow()) - datetime.timedelta(days=days)
+
+
+def run(now=None, coin_ids=None):
+    """Apply the configured retention policy to every coin (or ``coin_ids``).
+
+    Raw ticks are kept for RETENTION_RAW_DAYS, rounded out to whole calendar
+    months: older months are archived and removed from price_history. 1m and
+    1h candles are dropped after RETENTION_1M_DAYS / RETENTION_1H_DAYS; daily
+    candles are kept. Work is done per coin in RETENTION_BATCH_SIZE deletes,
+    so the job can run beside the API and be interrupted and re-run safely.
+    """
+    config = current_app.config
+    now = now or datetime.datetime.utcnow()
+    boundary = month_start(now - datetime.timedelta(days=config["RETENTION_RAW_DAYS"]))
+    batch_size, pause = config["RETENTION_BATCH_SIZE"], config["RETENTION_BATCH_PAUSE"]
+    candle_days = {resolution: config[key] for resolution, key in CANDLE_RETENTION.items()}
+    if coin_ids is None:
+        coin_ids = [row[0] for row in db.session.query(Cryptocurrency.id).order_by(Cryptocurrency.id)]
+
+    store = archive()
+    stats = RetentionStats()
+    for offset in range(0, len(coin_ids), WATERMARK_GROUP):
+        group = coin_ids[offset:offset + WATERMARK_GROUP]
+        archived = [coin_id for coin_id in group if archive_coin(store, coin_id, boundary, stats)]
+        # Readers switch to the archive before the rows go, so every tick is always
+        # served from exactly one place; one manifest write covers the whole group
+        watermarks = store.watermarks()
+        moved = {c: boundary for c in archived if (watermarks.get(c) or datetime.datetime.min) < boundary}
+        if moved:
+            store.set_watermarks(moved)
+        for coin_id in archived:
+            purge_coin(coin_id, boundary, batch_size, pause, stats)
+        for coin_id in group:
+            compact_candles(coin_id, now, candle_days, batch_size, pause, stats)
+    if stats.rebuilt or stats.compacted:
+        cache.bump("market")
+        cache.bump("history")
+    return stats
+
+
+if __name__ == '__main__':
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Archive expired price history and compact old candles")
+    parser.add_argument("ids", nargs="*", type=int, help="cryptocurrency ids to process (default: all)")
+    args = parser.parse_args()
+
+    with app.app_context():
+        stats = run(coin_ids=args.ids or None)
+        print(serialization.dumps(stats.to_dict(), pretty=True).decode())
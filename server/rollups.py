@@ -0,0 +1,178 @@
+# rollups.py
+import argparse
+import datetime
+from decimal import Decimal
+
+import cache
+import history
+from models import db, Cryptocurrency, PriceCandle
+
+# Pre-aggregated candle sizes, finest first
+ROLLUPS = ("1m", "1h", "1d")
+
+BULK_CHUNK = 5000
+
+
+def rollup_for(seconds):
+    """Coarsest rollup whose buckets tile a requested bucket size exactly."""
+    for name in reversed(ROLLUPS):
+        if seconds % history.RESOLUTIONS[name] == 0:
+            return name
+    return None
+
+
+def apply_ticks(ticks):
+    """Merge new ticks into the 1m/1h/1d candles in the current session.
+
+    ``ticks`` is an iterable of (cryptocurrency_id, recorded_at, price, volume)
+    tuples; volume is the amount traded since the previous tick, or None when
+    the source does not report one. Ticks are assumed to be newer than anything
+    already rolled up for their bucket (use ``rebuild`` after importing older
+    history). The caller owns the transaction, so candles commit atomically
+    with the ticks they summarise.
+    """
+    ticks = sorted(ticks, key=lambda t: (t[0], t[1]))
+    if not ticks:
+        return
+    coin_ids = {t[0] for t in ticks}
+
+    for resolution in ROLLUPS:
+        seconds = history.RESOLUTIONS[resolution]
+        partials = {}
+        for coin_id, recorded_at, price, volume in ticks:
+            key = (coin_id, history.bucket_start(recorded_at, seconds))
+            partial = partials.get(key)
+            if partial is None:
+                partials[key] = [price, price, price, price, volume or 0, 1]
+            else:
+                partial[1] = max(partial[1], price)
+                partial[2] = min(partial[2], price)
+                partial[3] = price
+                partial[4] += volume or 0
+                partial[5] += 1
+
+        buckets = {key[1] for key in partials}
+        existing = {
+            (c.cryptocurrency_id, c.bucket_start): c
+            for c in PriceCandle.query.filter(
+                PriceCandle.resolution == resolution,
+                PriceCandle.cryptocurrency_id.in_(coin_ids),
+                PriceCandle.bucket_start.in_(buckets),
+            )
+        }
+        for (coin_id, start), (open_, high, low, close, volume, count) in partials.items():
+            candle = existing.get((coin_id, start))
+            if candle is None:
+                db.session.add(PriceCandle(
+                    cryptocurrency_id=coin_id, resolution=resolution, bucket_start=start,
+                    open=open_, high=high, low=low, close=close, volume=volume, tick_count=count,
+                ))
+            else:
+                candle.high = max(candle.high, high)
+                candle.low = min(candle.low, low)
+                candle.close = close
+                candle.volume = (candle.volume or 0) + volume
+                candle.tick_count += count
+
+
+class CandleBuilder:
+    """Streams time-ordered ticks of one coin into closed candles of a single size."""
+
+    def __init__(self, cryptocurrency_id, resolution):
+        self.cryptocurrency_id = cryptocurrency_id
+        self.resolution = resolution
+        self.seconds = history.RESOLUTIONS[resolution]
+        self.current = None
+
+    def add(self, recorded_at, price):
+        start = history.bucket_start(recorded_at, self.seconds)
+        closed = None
+        if self.current is not None and self.current["bucket_start"] != start:
+            closed = self.current
+            self.current = None
+        if self.current is None:
+            self.current = {
+                "cryptocurrency_id": self.cryptocurrency_id, "resolution": self.resolution,
+                "bucket_start": start, "open": price, "high": price, "low": price, "close": price,
+                "volume": Decimal(0), "tick_count": 1,
+            }
+        else:
+            self.current["high"] = max(self.current["high"], price)
+            self.current["low"] = min(self.current["low"], price)
+            self.current["close"] = price
+            self.current["tick_count"] += 1
+        return closed
+
+    def flush(self):
+        closed, self.current = self.current, None
+        return closed
+
+
+def rebuild(cryptocurrency_ids=None, start=None, end=None):
+    """Recompute rollups from raw ticks; returns the number of candles written.
+
+    Buckets from each coin's first tick (or ``start``) up to ``end`` are
+    replaced, with both bounds widened to whole days so no bucket is left
+    half-built. Ticks below a coin's archive watermark are read back from the
+    archive, so archived months rebuild as completely as live ones; 1m/1h
+    candles that retention compacted in that range come back until its next
+    run. Each coin is rebuilt in its own transaction from one time-ordered
+    scan, so memory stays bounded by BULK_CHUNK regardless of history length.
+    """
+    import retention  # retention imports this module
+
+    if cryptocurrency_ids is None:
+        # Every listed coin, since one whose ticks are all archived has none left in price_history
+        cryptocurrency_ids = [row[0] for row in db.session.query(Cryptocurrency.id).order_by(Cryptocurrency.id)]
+    day = history.RESOLUTIONS[ROLLUPS[-1]]
+    if start is not None:
+        start = history.bucket_start(start, day)
+    if end is not None and history.bucket_start(end, day) != end:
+        end = history.bucket_start(end, day) + datetime.timedelta(seconds=day)
+
+    written = 0
+    for coin_id in cryptocurrency_ids:
+        first = next(retention.read_ticks(coin_id, start, end), None)
+        if first is None:
+            continue
+
+        for resolution in ROLLUPS:
+            candles = PriceCandle.query.filter(
+                PriceCandle.cryptocurrency_id == coin_id,
+                PriceCandle.resolution == resolution,
+                PriceCandle.bucket_start >= history.bucket_start(start or first[0], history.RESOLUTIONS[resolution]),
+            )
+            if end is not None:
+                candles = candles.filter(PriceCandle.bucket_start < end)
+            candles.delete(synchronize_session=False)
+
+        builders = [CandleBuilder(coin_id, resolution) for resolution in ROLLUPS]
+        pending = []
+        for recorded_at, price in retention.read_ticks(coin_id, start, end):
+            for builder in builders:
+                closed = builder.add(recorded_at, price)
+                if closed is not None:
+                    pending.append(closed)
+            if len(pending) >= BULK_CHUNK:
+                db.session.bulk_insert_mappings(PriceCandle, pending)
+                written += len(pending)
+                pending = []
+        pending.extend(c for c in (builder.flush() for builder in builders) if c is not None)
+        db.session.bulk_insert_mappings(PriceCandle, pending)
+        written += len(pending)
+        db.session.commit()
+    return written
+
+
+if __name__ == '__main__':
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Backfill or rebuild OHLCV rollups from price_history")
+    parser.add_argument("ids", nargs="*", type=int, help="cryptocurrency ids to rebuild (default: all)")
+    args = parser.parse_args()
+
+    with app.app_context():
+        count = rebuild(args.ids or None)
+        cache.bump("market")
+        cache.bump("history")
+        print(f"Rebuilt rollups: {count} candles written")
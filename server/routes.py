@@ -1,13 +1,69 @@
 # routes.py
 from flask import Blueprint, jsonify, request, current_app, g
 from functools import wraps
+from collections import namedtuple
 import jwt
 import datetime
-
-from models import db, Cryptocurrency, UserCryptocurrency, PriceHistory, TrendingCryptocurrency, User
+import itertools
+from sqlalchemy import Float, and_, or_, select, type_coerce
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, load_only
+
+import alerts
+import catalog
+import correlation
+import history
+import indicators
+import portfolio
+import pubsub
+import ratelimit
+import retention
+import rollups
+import search
+import serialization
+import trending
+import cache
+from cache import ResponseCache, TTLCache, cached_response, evict_on_commit, invalidate_on_commit
+from passwords import HashingBusy
+from signals import prices_committed
+from models import db, AlertTrigger, Cryptocurrency, UserCryptocurrency, PriceHistory, PriceCandle, User
 
 routes = Blueprint("routes", __name__)
 
+# Serialized catalog, price history and trending bodies, in the CACHE_URL backend so
+# workers share them. Every ingestion commit bumps the "market" version they all
+# depend on; ingestion writes with bulk statements, which the commit hooks cannot see
+catalog_cache = ResponseCache("catalog", depends=("market",))
+invalidate_on_commit(catalog_cache, Cryptocurrency)
+history_cache = ResponseCache("history", depends=("market",))
+trending_cache = ResponseCache("trending", depends=("market",))
+invalidate_on_commit(trending_cache, UserCryptocurrency)
+prices_committed.connect(lambda sender, **kwargs: cache.bump("market"), weak=False)
+
+# User id -> user projection, so authenticated requests skip the users lookup. Committed
+# edits and deletes evict that user's entry in this process; other workers may serve
+# the old projection for up to AUTH_CACHE_TTL seconds.
+auth_cache = TTLCache()
+evict_on_commit(auth_cache, User)
+
+@routes.record_once
+def configure(state):
+    pubsub.broker.max_subscribers = state.app.config["STREAM_MAX_SUBSCRIBERS"]
+    pubsub.broker.poll_interval = state.app.config["STREAM_POLL_INTERVAL"]
+    pubsub.broker.app = state.app
+    auth_cache.maxsize = state.app.config["AUTH_CACHE_SIZE"]
+    correlation.matrix_cache.ttl = state.app.config["CORRELATION_CACHE_TTL"]
+    trending.engine.k = state.app.config["TRENDING_TOP_K"]
+    trending.engine.refresh_interval = state.app.config["TRENDING_REFRESH_INTERVAL"]
+    ratelimit.limiter.identify = rate_limit_identity
+
+class AuthenticatedUser(namedtuple("AuthenticatedUser", ["id", "username", "email"])):
+    # Read-only stand-in for User on g.current_user; query User when the row itself is needed
+    __slots__ = ()
+
+    def to_dict(self):
+        return {"id": self.id, "username": self.username, "email": self.email}
+
 # Helper functions for JWT
 def generate_token(user):
     payload = {
@@ -38,10 +94,9 @@ def jwt_required(f):
         if parts[0].lower() != "bearer" or len(parts) != 2:
             return jsonify({"error": "Invalid authorization header"}), 401
         token = parts[1]
-        payload = decode_token(token)
-        if not payload:
+        user = authenticate(token)
+        if user is None:
             return jsonify({"error": "Invalid or expired token"}), 401
-        user = User.query.get(payload["user_id"])
         if not user:
             return jsonify({"error": "User not found"}), 401
         # Set user in Flask global for use in endpoints
@@ -49,8 +104,42 @@ def jwt_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def authenticate(token):
+    # Returns an AuthenticatedUser, None for a bad token, or False for a deleted user
+    payload = decode_token(token)
+    if not payload:
+        return None
+    ttl = current_app.config["AUTH_CACHE_TTL"]
+    if ttl > 0:
+        user = auth_cache.get(payload["user_id"])
+        if user is not None:
+            return user
+
+    row = db.session.query(User.id, User.username, User.email).filter_by(id=payload["user_id"]).first()
+    if not row:
+        return False
+    user = AuthenticatedUser(*row)
+    if ttl > 0:
+        auth_cache.set(user.id, user, ttl=ttl)
+    return user
+
+def rate_limit_identity():
+    # The limiter runs before any view, so it reads the bearer token itself; requests
+    # without a valid one are limited by IP instead
+    parts = request.headers.get("Authorization", "").split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        return None
+    payload = decode_token(parts[1])
+    return payload["user_id"] if payload else None
+
 # -------------------- USER AUTHENTICATION --------------------
 
+@routes.errorhandler(HashingBusy)
+def handle_hashing_busy(e):
+    response = jsonify({"error": "Too many sign-in attempts in progress, please retry shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @routes.route("/register", methods=["POST"])
 def register():
     data = request.get_json()
@@ -83,6 +172,11 @@ def login():
     if not user or not user.check_password(password):
         return jsonify({"error": "Invalid email or password"}), 401
 
+    # Upgrade hashes made with older parameters while the plaintext is at hand
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+
     token = generate_token(user)
     return jsonify({
         "message": "Login successful",
@@ -106,7 +200,10 @@ def check_session():
 def get_current_user():
     user = g.current_user
     # Check if the user has any favourite cryptocurrencies (watchlist)
-    if not user.cryptocurrencies:
+    has_watchlist = db.session.query(
+        UserCryptocurrency.query.filter_by(user_id=user.id).exists()
+    ).scalar()
+    if not has_watchlist:
         return jsonify({"error": "No favourite cryptocurrencies found. Please add at least one to your watchlist."}), 403
     return jsonify(user.to_dict()), 200
 
@@ -114,8 +211,53 @@ def get_current_user():
 
 @routes.route("/cryptocurrencies", methods=["GET"])
 def get_cryptocurrencies():
-    cryptocurrencies = Cryptocurrency.query.all()
-    return jsonify([crypto.to_dict() for crypto in cryptocurrencies]), 200
+    # Optional query params: fields (comma-separated), sort (market_cap, price, name,
+    # change_24h; prefix - for descending), limit and cursor (from X-Next-Cursor).
+    # Without them the whole catalog is returned in id order, as before.
+    try:
+        fields = catalog.parse_fields(request.args.get("fields"))
+        key, descending = catalog.parse_sort(request.args.get("sort"))
+        limit = history.parse_limit(request.args.get("limit"), default=None, maximum=catalog.MAX_LIMIT)
+        cursor = request.args.get("cursor")
+        after = catalog.decode_cursor(cursor, key) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        rows, next_cursor = catalog.page(fields, key, descending, limit, after)
+        response = serialization.rows_response(fields, rows)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
+
+    cache_key = (tuple(fields), key, descending, limit, cursor)
+    return cached_response(catalog_cache, cache_key, build, ttl=current_app.config["CATALOG_CACHE_TTL"])
+
+@routes.route("/cryptocurrencies/search", methods=["GET"])
+def search_cryptocurrencies():
+    # Prefix match on every word of ?q= against names and symbols, largest market cap first
+    query = request.args.get("q", "")
+    try:
+        limit = history.parse_limit(request.args.get("limit"), default=search.DEFAULT_LIMIT, maximum=search.MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(search.index.search(query, limit)), 200
+
+@routes.route("/cryptocurrencies/correlation", methods=["GET"])
+def get_correlation():
+    # Pairwise correlation of log returns over ?window= (e.g. 30d) at ?resolution=,
+    # optionally restricted to ?ids=1,2,3
+    try:
+        seconds = history.parse_resolution(request.args.get("resolution", "1h"))
+        if seconds is None:
+            raise ValueError("resolution must be a bucket size, not raw")
+        window = history.parse_duration(request.args.get("window", "30d"))
+        ids = request.args.get("ids")
+        ids = sorted({int(i) for i in ids.split(",")}) if ids else None
+        result = correlation.correlations(seconds, window, ids)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 200
 
 @routes.route("/cryptocurrencies/<int:crypto_id>", methods=["GET"])
 def get_cryptocurrency(crypto_id):
@@ -124,17 +266,176 @@ def get_cryptocurrency(crypto_id):
         return jsonify({"message": "Cryptocurrency not found"}), 404
     return jsonify(cryptocurrency.to_dict()), 200
 
+@routes.route("/cryptocurrencies/<int:crypto_id>/indicators", methods=["GET"])
+def get_indicators(crypto_id):
+    # SMA/EMA/RSI/Bollinger over the latest `limit` buckets of the given resolution
+    try:
+        seconds = history.parse_resolution(request.args.get("resolution", "1h"))
+        if seconds is None:
+            raise ValueError("resolution must be a bucket size, not raw")
+        window = int(request.args.get("window", 20))
+        k = float(request.args.get("k", 2))
+        limit = history.parse_limit(request.args.get("limit"), default=200)
+        if not 2 <= window <= 1000:
+            raise ValueError("window must be between 2 and 1000")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(indicators.indicator_points(crypto_id, seconds, window, k, limit)), 200
+
 # -------------------- PRICE HISTORY --------------------
 
 @routes.route("/price-history/<int:cryptocurrency_id>", methods=["GET"])
 def get_price_history(cryptocurrency_id):
-    history = PriceHistory.query.filter_by(cryptocurrency_id=cryptocurrency_id).all()
-    return jsonify([
-        {"id": h.id, "price": str(h.price), "recorded_at": h.recorded_at.isoformat()}
-        for h in history
-    ]), 200
+    # Query params: from/to (ISO-8601 or unix seconds), limit, cursor (taken from the
+    # X-Next-Cursor header of the previous page), resolution (raw or an OHLC bucket size)
+    # and format: json, or columns for float64 column buffers (see serialization.dump_columns),
+    # also chosen by sending Accept: application/vnd.price-columns
+    try:
+        start = history.parse_timestamp(request.args.get("from"))
+        end = history.parse_timestamp(request.args.get("to"))
+        limit = history.parse_limit(request.args.get("limit"))
+        resolution = history.parse_resolution(request.args.get("resolution"))
+        cursor = request.args.get("cursor")
+        after = history.decode_cursor(cursor) if cursor else None
+        fmt = request.args.get("format")
+        if fmt not in (None, "json", "columns"):
+            raise ValueError("format must be json or columns")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    columnar = fmt == "columns" or (
+        fmt is None and request.accept_mimetypes.best == serialization.COLUMNS_MIMETYPE
+    )
 
-# -------------------- USER CRYPTOCURRENCY TRACKING --------------------
+    def build():
+        # Column buffers are floats anyway, so skip building Decimals for them
+        numeric = (lambda column: type_coerce(column, Float)) if columnar else (lambda column: column)
+
+        if resolution is None:
+            # Ticks below the coin's retention watermark come from the archive files, ahead of the table's
+            watermark = retention.archive().watermark(cryptocurrency_id)
+            rows = []
+            if watermark is not None and (start is None or start < watermark) and (after is None or after[0] < watermark):
+                rows = list(itertools.islice(retention.archive().read(cryptocurrency_id, start, end, after), limit + 1))
+            query = db.session.query(
+                PriceHistory.id, PriceHistory.recorded_at, numeric(PriceHistory.price).label("price")
+            ).filter(
+                PriceHistory.cryptocurrency_id == cryptocurrency_id
+            )
+            if watermark is not None:
+                query = query.filter(PriceHistory.recorded_at >= watermark)
+            if start is not None:
+                query = query.filter(PriceHistory.recorded_at >= start)
+            if end is not None:
+                query = query.filter(PriceHistory.recorded_at < end)
+            if after is not None:
+                after_at, after_id = after
+                query = query.filter(or_(
+                    PriceHistory.recorded_at > after_at,
+                    and_(PriceHistory.recorded_at == after_at, PriceHistory.id > (after_id or 0)),
+                ))
+            query = query.order_by(PriceHistory.recorded_at.asc(), PriceHistory.id.asc())
+            if len(rows) <= limit:
+                rows += query.limit(limit + 1 - len(rows)).all()
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                row_id, recorded_at, _ = rows[-1]
+                next_cursor = history.encode_cursor(recorded_at, row_id)
+            keys = ("id", "recorded_at", "price")
+        else:
+            # Read the coarsest pre-aggregated rollup that tiles the requested bucket,
+            # so long ranges cost O(buckets) rather than O(ticks)
+            rollup = rollups.rollup_for(resolution)
+            lower = max(filter(None, (
+                history.bucket_start(start, resolution) if start is not None else None,
+                after[0] if after is not None else None,
+            )), default=None)
+            points = ()
+            # Retention drops fine rollups after a while; buckets older than that are
+            # folded from the raw ticks, which are kept (in the archive) for good
+            cutoff = retention.candle_cutoff(rollup)
+            if cutoff is not None and (lower is None or lower < cutoff):
+                split = history.bucket_start(cutoff, resolution) + datetime.timedelta(seconds=resolution)
+                if end is not None:
+                    split = min(split, end)
+                ticks = retention.read_ticks(cryptocurrency_id, lower, split)
+                if columnar:
+                    ticks = ((recorded_at, float(price)) for recorded_at, price in ticks)
+                points = ((recorded_at, price, price, price, price) for recorded_at, price in ticks)
+                lower = split
+            query = db.session.query(
+                PriceCandle.bucket_start,
+                *map(numeric, (PriceCandle.open, PriceCandle.high, PriceCandle.low, PriceCandle.close)),
+            ).filter(
+                PriceCandle.cryptocurrency_id == cryptocurrency_id,
+                PriceCandle.resolution == rollup,
+            )
+            if lower is not None:
+                query = query.filter(PriceCandle.bucket_start >= lower)
+            if end is not None:
+                query = query.filter(PriceCandle.bucket_start < end)
+            query = query.order_by(PriceCandle.bucket_start.asc())
+            buckets, has_more = history.downsample(
+                itertools.chain(points, query.yield_per(1000)), resolution, limit
+            )
+            next_cursor = None
+            if has_more:
+                next_cursor = history.encode_cursor(buckets[-1][0] + datetime.timedelta(seconds=resolution))
+            keys, rows = history.BUCKET_KEYS, map(history.bucket_row, buckets)
+
+        if columnar:
+            # recorded_at becomes epoch milliseconds; price repeats close for buckets
+            values = list(zip(*rows)) or [()] * len(keys)
+            columns = {key: column for key, column in zip(keys, values) if key != "price" or resolution is None}
+            columns["recorded_at"] = serialization.epoch_ms(columns["recorded_at"])
+            response = current_app.response_class(
+                serialization.dump_columns(columns, next_cursor=next_cursor), mimetype=serialization.COLUMNS_MIMETYPE
+            )
+        else:
+            # Decimals serialize as strings and datetimes as ISO-8601, as the dict path did
+            response = serialization.rows_response(keys, rows)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
+
+    key = (cryptocurrency_id, start, end, limit, resolution, cursor, columnar)
+    response = cached_response(history_cache, key, build, ttl=current_app.config["HISTORY_CACHE_TTL"])
+    response.vary.add("Accept")
+    return response
+
+# -------------------- PRICE STREAM --------------------
+
+@routes.route("/stream/prices", methods=["GET"])
+def stream_prices():
+    # Server-sent price deltas as ingestion commits them. scope=watchlist narrows the
+    # stream to the caller's coins; EventSource cannot set headers, so ?token= also works
+    coin_ids = None
+    if request.args.get("scope") == "watchlist":
+        token = request.args.get("token")
+        auth = request.headers.get("Authorization", "").split()
+        if not token and len(auth) == 2 and auth[0].lower() == "bearer":
+            token = auth[1]
+        user = authenticate(token) if token else None
+        if user is None:
+            return jsonify({"error": "Invalid or expired token"}), 401
+        if not user:
+            return jsonify({"error": "User not found"}), 401
+        coin_ids = [
+            row[0] for row in db.session.query(UserCryptocurrency.cryptocurrency_id)
+            .filter_by(user_id=user.id)
+        ]
+
+    subscriber = pubsub.broker.subscribe(coin_ids)
+    if subscriber is None:
+        return jsonify({"error": "Too many open streams, try again later"}), 503
+
+    response = current_app.response_class(
+        pubsub.broker.stream(subscriber, heartbeat=current_app.config["STREAM_HEARTBEAT"]),
+        mimetype="text/event-stream",
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 # -------------------- USER CRYPTOCURRENCY TRACKING --------------------
 
@@ -145,6 +446,55 @@ def get_user_cryptocurrencies():
     user_cryptos = UserCryptocurrency.query.filter_by(user_id=user.id).all()
     return jsonify([uc.to_dict() for uc in user_cryptos]), 200
 
+@routes.route("/watchlist", methods=["GET"])
+@jwt_required
+def get_watchlist():
+    # Watchlist entries joined with their coin and latest price point in a single
+    # statement, whatever the watchlist size
+    user = g.current_user
+    latest_point = (
+        select(PriceHistory.id)
+        .where(PriceHistory.cryptocurrency_id == UserCryptocurrency.cryptocurrency_id)
+        .order_by(PriceHistory.recorded_at.desc(), PriceHistory.id.desc())
+        .limit(1)
+        .correlate(UserCryptocurrency)
+        .scalar_subquery()
+    )
+    rows = (
+        db.session.query(UserCryptocurrency, PriceHistory.price, PriceHistory.recorded_at)
+        .options(
+            load_only(UserCryptocurrency.id, UserCryptocurrency.cryptocurrency_id, UserCryptocurrency.alert_price),
+            joinedload(UserCryptocurrency.cryptocurrency).load_only(
+                Cryptocurrency.name, Cryptocurrency.symbol, Cryptocurrency.market_price, Cryptocurrency.logo_url
+            ),
+        )
+        .outerjoin(PriceHistory, PriceHistory.id == latest_point)
+        .filter(UserCryptocurrency.user_id == user.id)
+        .order_by(UserCryptocurrency.id.asc())
+        .all()
+    )
+
+    watchlist = []
+    for entry, latest_price, latest_at in rows:
+        crypto = entry.cryptocurrency
+        distance = entry.alert_price - crypto.market_price
+        watchlist.append({
+            "id": entry.id,
+            "cryptocurrency_id": entry.cryptocurrency_id,
+            "name": crypto.name,
+            "symbol": crypto.symbol,
+            "logo_url": crypto.logo_url,
+            "market_price": float(crypto.market_price),
+            "alert_price": float(entry.alert_price),
+            "distance_to_alert": float(distance),
+            "distance_to_alert_pct": float(distance / crypto.market_price * 100) if crypto.market_price else None,
+            "latest_price": (
+                {"price": str(latest_price), "recorded_at": latest_at.isoformat()}
+                if latest_at is not None else None
+            ),
+        })
+    return jsonify(watchlist), 200
+
 @routes.route("/user-cryptocurrencies", methods=["POST"])
 @jwt_required
 def add_user_cryptocurrency():
@@ -160,6 +510,11 @@ def add_user_cryptocurrency():
     except ValueError:
         return jsonify({"error": "Alert price must be a valid number"}), 400
 
+    try:
+        holdings = {name: float(data[name]) for name in ("quantity", "cost_basis") if data.get(name) is not None}
+    except (TypeError, ValueError):
+        return jsonify({"error": "Quantity and cost basis must be valid numbers"}), 400
+
     user = g.current_user
     existing_entry = UserCryptocurrency.query.filter_by(
         user_id=user.id, cryptocurrency_id=crypto_id
@@ -170,10 +525,16 @@ def add_user_cryptocurrency():
     user_crypto = UserCryptocurrency(
         user_id=user.id,
         cryptocurrency_id=crypto_id,
-        alert_price=alert_price
+        alert_price=alert_price,
+        **holdings
     )
     db.session.add(user_crypto)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request added the same coin between the check and the insert
+        db.session.rollback()
+        return jsonify({"error": "Cryptocurrency already in watchlist"}), 409
 
     return jsonify({"message": "Cryptocurrency added to user watchlist"}), 201
 
@@ -193,17 +554,134 @@ def remove_user_cryptocurrency(crypto_id):
 
     return jsonify({"message": "Cryptocurrency removed from watchlist"}), 200
 
+WATCHLIST_FIELDS = ("alert_price", "quantity", "cost_basis")
+
+def parse_watchlist_entries(entries, required=("alert_price",)):
+    # [{"crypto_id": ..., "alert_price": ..., "quantity": ..., "cost_basis": ...}] -> {crypto_id: {field: value}}
+    parsed = {}
+    for entry in entries:
+        fields = {name: float(entry[name]) for name in WATCHLIST_FIELDS if entry.get(name) is not None}
+        if not fields or any(name not in fields for name in required):
+            raise ValueError("missing field")
+        parsed[int(entry["crypto_id"])] = fields
+    return parsed
+
+@routes.route("/user-cryptocurrencies/batch", methods=["POST"])
+@jwt_required
+def batch_user_cryptocurrencies():
+    # Apply many watchlist changes in one transaction. Body:
+    # {"add": [{"crypto_id", "alert_price", "quantity"?, "cost_basis"?}],
+    #  "update": [{"crypto_id", any of "alert_price"/"quantity"/"cost_basis"}], "remove": [crypto_id]}
+    data = request.get_json() or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object with add, update and/or remove"}), 400
+    try:
+        adds = parse_watchlist_entries(data.get("add", []))
+        updates = parse_watchlist_entries(data.get("update", []), required=())
+        removes = {int(crypto_id) for crypto_id in data.get("remove", [])}
+    except (TypeError, ValueError, KeyError):
+        return jsonify({"error": "Entries need a numeric crypto_id and alert_price (quantity and cost_basis optional)"}), 400
+
+    touched = set(adds) | set(updates) | removes
+    if not touched:
+        return jsonify({"error": "Nothing to change"}), 400
+    if len(touched) != len(adds) + len(updates) + len(removes):
+        return jsonify({"error": "A cryptocurrency may appear in only one of add, update or remove"}), 400
+
+    user = g.current_user
+    # One set-based lookup replaces a filter_by().first() per coin
+    existing = dict(
+        db.session.query(UserCryptocurrency.cryptocurrency_id, UserCryptocurrency.id).filter(
+            UserCryptocurrency.user_id == user.id,
+            UserCryptocurrency.cryptocurrency_id.in_(touched),
+        )
+    )
+    already_watched = sorted(crypto_id for crypto_id in adds if crypto_id in existing)
+    not_watched = sorted(crypto_id for crypto_id in (set(updates) | removes) if crypto_id not in existing)
+    if already_watched or not_watched:
+        return jsonify({
+            "error": "Some changes conflict with your watchlist, nothing was applied",
+            "already_in_watchlist": already_watched,
+            "not_in_watchlist": not_watched,
+        }), 409
+
+    db.session.bulk_insert_mappings(UserCryptocurrency, [
+        {"user_id": user.id, "cryptocurrency_id": crypto_id, **fields}
+        for crypto_id, fields in adds.items()
+    ])
+    db.session.bulk_update_mappings(UserCryptocurrency, [
+        {"id": existing[crypto_id], **fields}
+        for crypto_id, fields in updates.items()
+    ])
+    if removes:
+        UserCryptocurrency.query.filter(
+            UserCryptocurrency.id.in_([existing[crypto_id] for crypto_id in removes])
+        ).delete(synchronize_session=False)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The unique (user_id, cryptocurrency_id) constraint caught a concurrent add
+        db.session.rollback()
+        return jsonify({"error": "Watchlist changed, nothing was applied"}), 409
+
+    # Bulk statements skip the session hooks that keep the alert index and trending current
+    alerts.engine.invalidate(touched)
+    trending_cache.clear()
+    if adds:
+        trending.engine.record_adds(adds)
+    return jsonify({"added": len(adds), "updated": len(updates), "removed": len(removes)}), 200
+
+# -------------------- PORTFOLIO --------------------
+
+@routes.route("/portfolio", methods=["GET"])
+@jwt_required
+def get_portfolio():
+    user = g.current_user
+    return jsonify(portfolio.valuation(user.id)), 200
+
+@routes.route("/portfolio/history", methods=["GET"])
+@jwt_required
+def get_portfolio_history():
+    # Portfolio value curve from the price rollups; defaults to hourly over the last week
+    try:
+        seconds = history.parse_resolution(request.args.get("resolution", "1h"))
+        end = history.parse_timestamp(request.args.get("to")) or datetime.datetime.utcnow()
+        start = history.parse_timestamp(request.args.get("from")) or end - datetime.timedelta(days=7)
+        if seconds is None:
+            raise ValueError("resolution must be a bucket size, not raw")
+        curve = portfolio.value_curve(g.current_user.id, seconds, start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(curve), 200
+
+# -------------------- PRICE ALERTS --------------------
+
+@routes.route("/alerts", methods=["GET"])
+@jwt_required
+def get_triggered_alerts():
+    user = g.current_user
+    triggers = (
+        AlertTrigger.query.filter_by(user_id=user.id)
+        .order_by(AlertTrigger.triggered_at.desc(), AlertTrigger.id.desc())
+        .limit(100)
+        .all()
+    )
+    return jsonify([t.to_dict() for t in triggers]), 200
 
 # -------------------- TRENDING CRYPTOCURRENCIES --------------------
 
 @routes.route("/trending-cryptocurrencies", methods=["GET"])
 @jwt_required
 def get_trending_cryptocurrencies():
-    trending = TrendingCryptocurrency.query.order_by(TrendingCryptocurrency.rank.asc()).all()
-    return jsonify([
-        {"id": t.id, "cryptocurrency_id": t.cryptocurrency_id, "rank": t.rank}
-        for t in trending
-    ]), 200
+    # Served from the trending engine's pre-serialized snapshot. With a shared cache the
+    # ticks may have been ingested by another process, so the worker that misses
+    # reranks from the database and every other worker reuses its body
+    def build():
+        if trending_cache.shared:
+            trending.engine.load()
+        return current_app.response_class(trending.engine.current().body, mimetype="application/json")
+
+    return cached_response(trending_cache, ("trending",), build, ttl=current_app.config["TRENDING_CACHE_TTL"])
 
 # -------------------- DEBUG SESSION --------------------
 
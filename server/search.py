@@ -0,0 +1,193 @@
+# search.py
+import re
+import threading
+import time
+
+from models import Cryptocurrency
+from signals import prices_committed
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+# Above this many matches, walk the market-cap order instead of sorting the matches
+_SCAN_THRESHOLD = 256
+
+
+def tokens(*texts):
+    """Lower-cased words of ``texts``, plus each text with separators removed.
+
+    "Bitcoin Cash" yields bitcoin, cash and bitcoincash, so both "cash" and
+    "bitcoinc" find it.
+    """
+    found = set()
+    for text in texts:
+        words = _TOKEN.findall((text or "").lower())
+        found.update(words)
+        if len(words) > 1:
+            found.add("".join(words))
+    return found
+
+
+class TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+
+
+class SearchIndex:
+    """Prefix trie over coin names and symbols, ranked by market cap.
+
+    Every node holds the ids of all coins with a token under that prefix, so
+    a lookup is one walk down the trie per query word plus a set intersection.
+    Entries are re-indexed individually when ingestion lists or renames a
+    coin; a reload every ``refresh_interval`` seconds diffs against the table
+    to pick up changes made by other processes and refreshes the ranking.
+    """
+
+    def __init__(self, refresh_interval=60):
+        self.refresh_interval = refresh_interval
+        self.root = TrieNode()
+        self.entries = {}
+        self.ranked = []
+        self.rank = {}
+        self._indexed = {}
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    # -------------------- TRIE --------------------
+
+    def _insert(self, token, coin_id):
+        node = self.root
+        for char in token:
+            node = node.children.setdefault(char, TrieNode())
+            node.ids.add(coin_id)
+
+    def _remove(self, token, coin_id):
+        path = [self.root]
+        for char in token:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        for parent, char, node in zip(reversed(path[:-1]), reversed(token), reversed(path[1:])):
+            node.ids.discard(coin_id)
+            if not node.ids:
+                del parent.children[char]
+
+    def _find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+    # -------------------- MAINTENANCE --------------------
+
+    def put(self, coin):
+        """Index or re-index one coin dict (as produced by ``Cryptocurrency.to_dict``)."""
+        with self._lock:
+            coin_id = coin["id"]
+            # Tokens share prefix nodes, so drop every old path before adding the new ones
+            for token in self._indexed.get(coin_id, ()):
+                self._remove(token, coin_id)
+            self._indexed[coin_id] = tokens(coin["name"], coin["symbol"])
+            for token in self._indexed[coin_id]:
+                self._insert(token, coin_id)
+            self.entries[coin_id] = coin
+
+    def discard(self, coin_id):
+        with self._lock:
+            for token in self._indexed.pop(coin_id, ()):
+                self._remove(token, coin_id)
+            self.entries.pop(coin_id, None)
+
+    def _rerank(self):
+        self.ranked = sorted(self.entries, key=lambda coin_id: (-self.entries[coin_id]["market_cap"], coin_id))
+        self.rank = {coin_id: position for position, coin_id in enumerate(self.ranked)}
+
+    def apply(self, coins, complete=True):
+        """Merge coin dicts into the index, re-indexing only changed names and symbols.
+
+        With ``complete`` the dicts are the whole catalog: missing coins are
+        dropped and the reload clock restarts.
+        """
+        coins = {coin["id"]: coin for coin in coins}
+        with self._lock:
+            if complete:
+                for coin_id in set(self.entries) - set(coins):
+                    self.discard(coin_id)
+            listed = False
+            for coin in coins.values():
+                current = self.entries.get(coin["id"])
+                listed = listed or current is None
+                if current is None or (current["name"], current["symbol"]) != (coin["name"], coin["symbol"]):
+                    self.put(coin)
+                else:
+                    current.update(coin)
+            # Renames keep their position until the next full reload refreshes market caps
+            if complete or listed:
+                self._rerank()
+            if complete:
+                self._loaded_at = time.monotonic()
+
+    def load(self, ids=None):
+        """Sync with the table, or with just the rows in ``ids``."""
+        query = Cryptocurrency.query
+        if ids is not None:
+            query = query.filter(Cryptocurrency.id.in_(ids))
+        self.apply([coin.to_dict() for coin in query], complete=ids is None)
+
+    def _sync(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.load()
+
+    def on_ticks(self, ticks, changed):
+        """Apply an ingestion tick: re-index listed or renamed coins, update prices."""
+        if self._loaded_at is None:
+            return
+        if changed:
+            self.load(changed)
+        with self._lock:
+            for coin_id, _, price, _ in ticks:
+                entry = self.entries.get(coin_id)
+                if entry is not None:
+                    entry["market_price"] = float(price)
+
+    # -------------------- LOOKUP --------------------
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Coins having a token that starts with every word of ``query``, largest market cap first."""
+        self._sync()
+        words = sorted(set(_TOKEN.findall(query.lower())), key=len, reverse=True)
+        if not words:
+            return []
+        with self._lock:
+            matches = None
+            for word in words:
+                found = self._find(word)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    return []
+            if len(matches) <= _SCAN_THRESHOLD:
+                ordered = sorted(matches, key=self.rank.__getitem__)[:limit]
+            else:
+                ordered = []
+                for coin_id in self.ranked:
+                    if coin_id in matches:
+                        ordered.append(coin_id)
+                        if len(ordered) == limit:
+                            break
+            return [dict(self.entries[coin_id]) for coin_id in ordered]
+
+
+index = SearchIndex()
+
+
+@prices_committed.connect
+def _on_prices_committed(sender, ticks, created=(), renamed=(), **kwargs):
+    index.on_ticks(ticks, set(created) | set(renamed))
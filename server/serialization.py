@@ -0,0 +1,124 @@
+# serialization.py
+import dataclasses
+import datetime
+import decimal
+import json
+import struct
+import uuid
+
+import numpy as np
+from flask import current_app
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(obj):
+    # Decimal keeps its exact digits as a string, as Flask's default provider does
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(obj, pretty=False):
+        """Serialize ``obj`` to UTF-8 JSON bytes (ISO-8601 datetimes, Decimals as strings)."""
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+
+    loads = orjson.loads
+else:
+    def dumps(obj, pretty=False):
+        """Serialize ``obj`` to UTF-8 JSON bytes (ISO-8601 datetimes, Decimals as strings)."""
+        if pretty:
+            return json.dumps(obj, default=_default, ensure_ascii=False, indent=2).encode()
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+def dump_rows(keys, rows):
+    """Serialize SQL result tuples as a JSON array of objects keyed by ``keys``.
+
+    Rows go straight to the encoder with no model instances or per-field
+    conversion in between; select numeric columns with ``type_coerce(col,
+    Float)`` where floats are wanted to skip Decimal construction as well.
+    """
+    return dumps([dict(zip(keys, row)) for row in rows])
+
+
+def rows_response(keys, rows, status=200):
+    return current_app.response_class(dump_rows(keys, rows), status=status, mimetype="application/json")
+
+
+# -------------------- COLUMNAR --------------------
+
+COLUMNS_MIMETYPE = "application/vnd.price-columns"
+COLUMNS_MAGIC = b"PCOL"
+
+
+def dump_columns(columns, **meta):
+    """Pack equal-length columns as little-endian float64 buffers behind a JSON header.
+
+    Layout: ``PCOL`` | uint32 header length | header JSON, space-padded so
+    the buffers start 8-byte aligned | one ``rows * 8`` byte buffer per
+    column, in header order. The header lists ``rows``, the column names
+    and any ``meta``, so a browser can wrap each buffer in a Float64Array
+    without copying or parsing numbers.
+    """
+    arrays = [np.ascontiguousarray(values, dtype="<f8") for values in columns.values()]
+    rows = len(arrays[0]) if arrays else 0
+    header = dumps({"rows": rows, "columns": list(columns), "dtype": "float64", **meta})
+    header += b" " * (-(len(COLUMNS_MAGIC) + 4 + len(header)) % 8)
+    return b"".join([COLUMNS_MAGIC, struct.pack("<I", len(header)), header, *(a.tobytes() for a in arrays)])
+
+
+def load_columns(data):
+    """Inverse of ``dump_columns``: returns (header dict, {name: float64 array})."""
+    if data[:4] != COLUMNS_MAGIC:
+        raise ValueError("Not a columnar body")
+    (length,) = struct.unpack_from("<I", data, 4)
+    header = loads(data[8:8 + length])
+    offset, size = 8 + length, header["rows"] * 8
+    columns = {}
+    for name in header["columns"]:
+        columns[name] = np.frombuffer(data, dtype="<f8", count=header["rows"], offset=offset)
+        offset += size
+    return header, columns
+
+
+def epoch_ms(datetimes):
+    """Naive UTC datetimes as float64 milliseconds since the epoch (JavaScript Date values)."""
+    return np.array(list(datetimes), dtype="datetime64[us]").astype(np.int64) / 1000.0
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson when installed, else the stdlib encoder.
+
+    Responses are compact unless ``compact`` is False, and are built from
+    bytes without an intermediate str.
+    """
+
+    compact = True
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, pretty=self.compact is False), mimetype=self.mimetype)
@@ -0,0 +1,12 @@
+# signals.py
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent after an ingestion tick commits. Receivers get the ingestor as sender and:
+#   ticks    - list of (cryptocurrency_id, recorded_at, price, volume) tuples, where
+#              volume is the source's rolling 24h volume (None if not reported)
+#   previous - {cryptocurrency_id: market_price before this tick} for known coins
+#   created  - ids of coins first seen in this tick
+#   renamed  - ids of known coins whose name changed in this tick
+prices_committed = _signals.signal("prices-committed")
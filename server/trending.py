@@ -0,0 +1,259 @@
+# trending.py
+import datetime
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from models import db, Cryptocurrency, PriceCandle, UserCryptocurrency
+from serialization import dumps
+from signals import prices_committed
+
+logger = logging.getLogger(__name__)
+
+_ADDED = "trending-coins-added"
+
+# Look-back for momentum and watchlist-add velocity
+WINDOW = datetime.timedelta(hours=24)
+
+
+class TopK:
+    """Rolling top-k keys by score: a min-heap of the k best, with lazy deletion.
+
+    ``update`` costs O(log k). A member whose score changes gets a fresh heap
+    entry and its old one is skipped when it reaches the top; the heap is
+    compacted once stale entries outnumber live ones. A member whose score
+    drops stays in until something better arrives, so callers rebuild from
+    scratch periodically to catch outsiders that are not being updated.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.scores = {}
+        self._heap = []
+
+    def _trim(self):
+        heap = self._heap
+        while heap and self.scores.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def min_score(self):
+        self._trim()
+        return self._heap[0][0] if self._heap else None
+
+    def update(self, key, score):
+        if key not in self.scores and len(self.scores) >= self.k:
+            if score <= self.min_score():
+                return False
+            _, evicted = heapq.heappop(self._heap)
+            del self.scores[evicted]
+        self.scores[key] = score
+        heapq.heappush(self._heap, (score, key))
+        if len(self._heap) > 2 * self.k + 16:
+            self._heap = [(s, key) for key, s in self.scores.items()]
+            heapq.heapify(self._heap)
+        return True
+
+    def discard(self, key):
+        self.scores.pop(key, None)
+
+    def ranked(self):
+        return sorted(self.scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+Snapshot = namedtuple("Snapshot", ["version", "generated_at", "body"])
+
+
+class Signals:
+    """Raw inputs for one coin's score."""
+
+    __slots__ = ("symbol", "price", "reference", "volume", "adds")
+
+    def __init__(self, symbol, price, reference, volume, adds):
+        self.symbol = symbol
+        self.price = price
+        self.reference = reference
+        self.volume = volume
+        self.adds = adds
+
+    def features(self):
+        momentum = self.price / self.reference - 1 if self.reference else 0.0
+        return momentum, math.log1p(self.volume or 0.0), float(self.adds)
+
+
+class TrendingEngine:
+    """Ranks coins by 24h momentum, trading volume and watchlist-add velocity.
+
+    Every ``refresh_interval`` seconds the inputs are reloaded in two queries
+    and the feature means/deviations used for scoring are re-estimated. In
+    between, ingestion ticks and watchlist adds rescore only the coins they
+    touch and feed the top-k heap, and each batch publishes a new snapshot:
+    an immutable, pre-serialized body the endpoint serves without a query.
+    """
+
+    def __init__(self, k=10, refresh_interval=300, weights=(1.0, 0.5, 1.0)):
+        self.k = k
+        self.refresh_interval = refresh_interval
+        self.weights = weights
+        self.signals = {}
+        self.snapshot = None
+        self._top = TopK(k)
+        self._stats = ((0.0, 1.0),) * 3
+        self._version = 0
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    # -------------------- SCORING --------------------
+
+    def score(self, coin_id):
+        features = self.signals[coin_id].features()
+        return sum(
+            weight * (value - mean) / deviation
+            for weight, value, (mean, deviation) in zip(self.weights, features, self._stats)
+        )
+
+    def _estimate_stats(self):
+        columns = list(zip(*(s.features() for s in self.signals.values()))) or [()] * 3
+        stats = []
+        for values in columns:
+            mean = sum(values) / len(values) if values else 0.0
+            deviation = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values)) if values else 0.0
+            stats.append((mean, deviation or 1.0))
+        self._stats = tuple(stats)
+
+    # -------------------- LOADING --------------------
+
+    def load(self, now=None):
+        """Rebuild every coin's inputs, the scoring statistics and the heap."""
+        now = now or datetime.datetime.utcnow()
+        since = now - WINDOW
+        reference = (
+            select(PriceCandle.close)
+            .where(
+                PriceCandle.cryptocurrency_id == Cryptocurrency.id,
+                PriceCandle.resolution == "1h",
+                PriceCandle.bucket_start <= since,
+            )
+            .order_by(PriceCandle.bucket_start.desc())
+            .limit(1)
+            .correlate(Cryptocurrency)
+            .scalar_subquery()
+        )
+        adds = dict(
+            db.session.query(UserCryptocurrency.cryptocurrency_id, func.count())
+            .filter(UserCryptocurrency.created_at >= since)
+            .group_by(UserCryptocurrency.cryptocurrency_id)
+        )
+        rows = db.session.query(
+            Cryptocurrency.id, Cryptocurrency.symbol, Cryptocurrency.market_price, reference, Cryptocurrency.volume_24h
+        ).all()
+
+        with self._lock:
+            self.signals = {
+                coin_id: Signals(
+                    symbol, float(price), float(ref) if ref else None,
+                    float(vol) if vol is not None else None, adds.get(coin_id, 0),
+                )
+                for coin_id, symbol, price, ref, vol in rows
+            }
+            self._estimate_stats()
+            self._top = TopK(self.k)
+            for coin_id in self.signals:
+                self._top.update(coin_id, self.score(coin_id))
+            self._loaded_at = time.monotonic()
+            self._publish(now)
+
+    def _stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+
+    def _publish(self, now):
+        self._version += 1
+        entries = []
+        for rank, (coin_id, score) in enumerate(self._top.ranked(), start=1):
+            signals = self.signals[coin_id]
+            momentum, _, _ = signals.features()
+            # "id" was the trending_cryptocurrencies row id; entries are unique per coin,
+            # so the coin id keeps that field stable for clients that key on it
+            entries.append({
+                "id": coin_id,
+                "cryptocurrency_id": coin_id,
+                "symbol": signals.symbol,
+                "rank": rank,
+                "score": round(score, 4),
+                "change_24h": round(momentum * 100, 4),
+                "volume_24h": signals.volume,
+                "watchlist_adds_24h": signals.adds,
+            })
+        self.snapshot = Snapshot(self._version, now, dumps(entries))
+
+    # -------------------- UPDATES --------------------
+
+    def on_ticks(self, ticks, created=()):
+        """Rescore the coins in an ingestion tick; new listings force a reload."""
+        if created or self._stale():
+            self.load()
+            return
+        with self._lock:
+            for coin_id, _, price, volume in ticks:
+                signals = self.signals.get(coin_id)
+                if signals is None:
+                    continue
+                signals.price = float(price)
+                if volume is not None:
+                    signals.volume = float(volume)
+                self._top.update(coin_id, self.score(coin_id))
+            self._publish(datetime.datetime.utcnow())
+
+    def record_adds(self, coin_ids):
+        """Count new watchlist rows towards their coins' add velocity."""
+        with self._lock:
+            if not self.signals:
+                return
+            for coin_id in coin_ids:
+                signals = self.signals.get(coin_id)
+                if signals is None:
+                    continue
+                signals.adds += 1
+                self._top.update(coin_id, self.score(coin_id))
+            self._publish(datetime.datetime.utcnow())
+
+    def current(self):
+        """The latest snapshot, reloading first if it is missing or past ``refresh_interval``."""
+        if self._stale():
+            self.load()
+        return self.snapshot
+
+
+engine = TrendingEngine()
+
+
+@prices_committed.connect
+def _on_prices_committed(sender, ticks, created=(), **kwargs):
+    try:
+        engine.on_ticks(ticks, created)
+    except Exception:
+        logger.exception("Trending update failed")
+
+
+@event.listens_for(Session, "after_flush")
+def _track_watchlist_adds(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, UserCryptocurrency):
+            session.info.setdefault(_ADDED, []).append(obj.cryptocurrency_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _count_watchlist_adds(session):
+    coin_ids = session.info.pop(_ADDED, None)
+    if coin_ids:
+        engine.record_adds(coin_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_watchlist_adds(session):
+    session.info.pop(_ADDED, None)